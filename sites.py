@@ -8,6 +8,10 @@
 #         "texto claro de que no existe",
 #         "otro texto",
 #     ],
+#     "max_bytes": 262144,  # opcional: tope de body para este sitio
+#     "dns_catch_all": True,  # opcional ({username}.host): la IP comodin del DNS = no existe.
+#                             # Solo si el comodin apunta a IPs distintas de las de los
+#                             # usuarios reales (no es el caso de itch.io/tumblr/bandcamp).
 # },
 #
 # Solo copias un bloque, cambias name/slug/url
@@ -0,0 +1,81 @@
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tyke  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Estado en un directorio temporal y singletons a cero en cada test."""
+    monkeypatch.setattr(tyke, "STATE_DIR", str(tmp_path))
+    for name in (
+        "HTTP_POOL",
+        "TRANSPORT",
+        "REDIRECT_MEMORY",
+        "HOST_LIMITER",
+        "LATENCY_HISTORY",
+        "RESPONSE_CACHE_DB",
+        "VERDICT_CACHE",
+        "SCAN_DEADLINE",
+    ):
+        monkeypatch.setattr(tyke, name, None)
+    monkeypatch.setattr(tyke, "BODY_MEMO", tyke.BodyMemo())
+    monkeypatch.setattr(tyke, "DNS_CACHE", tyke.DnsCache())
+    yield
+    if tyke.RESPONSE_CACHE_DB is not None:
+        tyke.RESPONSE_CACHE_DB.close()
+
+
+@pytest.fixture
+def serve():
+    """Arranca un ThreadingHTTPServer local; route(handler) -> (status, headers, body).
+
+    Devuelve la url base; handler.server.hits cuenta las requests por path.
+    """
+    servers = []
+
+    def start(route):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def _reply(self, with_body):
+                self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+                status, headers, body = route(self)
+                data = body.encode() if isinstance(body, str) else body
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(True)
+
+            def do_HEAD(self):
+                self._reply(False)
+
+            def log_message(self, *args):
+                pass
+
+        srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        srv.hits = {}
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return f"http://127.0.0.1:{srv.server_port}", srv
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def make_site(url, **extra):
+    raw = {"name": "T", "slug": "t", "url": url}
+    raw.update(extra)
+    return tyke.Site(raw)
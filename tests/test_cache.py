@@ -0,0 +1,140 @@
+import time
+
+import tyke
+from conftest import make_site
+
+
+def new_response_cache(tmp_path, **kwargs):
+    return tyke.ResponseCache(str(tmp_path / "responses.sqlite"), **kwargs)
+
+
+def test_response_cache_roundtrip_and_ttl(tmp_path):
+    cache = new_response_cache(tmp_path)
+    cache.put("http://x.test/alice", "https://x.test/alice/", 200, "hola alice", False)
+    # se encuentra tanto por la url pedida como por la final
+    assert cache.get("http://x.test/alice", 60) == ("https://x.test/alice/", 200, "hola alice", False)
+    assert cache.get("https://x.test/alice/", 60)[2] == "hola alice"
+    assert cache.get("http://x.test/alice", -1) is None
+    assert cache.get("http://x.test/bob", 60) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+
+def test_response_cache_validators_and_revalidate(tmp_path):
+    cache = new_response_cache(tmp_path)
+    assert cache.conditional_headers("https://x.test/alice") == {}
+    assert cache.revalidate("https://x.test/alice") is None
+    headers = {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    cache.put("https://x.test/alice", "https://x.test/alice", 200, "body", True, headers)
+    assert cache.conditional_headers("https://x.test/alice") == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert cache.revalidate("https://x.test/alice") == ("https://x.test/alice", 200, "body", True)
+    assert cache.revalidated == 1
+    cache.close()
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = new_response_cache(tmp_path, max_bytes=600)
+    body = "".join(chr(0x4E00 + (i * 7919) % 20000) for i in range(200))  # no comprime
+    for name in ("a", "b", "c"):
+        cache.put(f"https://x.test/{name}", f"https://x.test/{name}", 200, name + body, False)
+        time.sleep(0.01)
+    assert cache.get("https://x.test/a", 60) is None
+    assert cache.get("https://x.test/c", 60) is not None
+    cache.close()
+
+
+def test_response_cache_sqlite_error_disables_cache(tmp_path, capsys):
+    cache = new_response_cache(tmp_path)
+    cache.put("https://x.test/a", "https://x.test/a", 200, "a", False)
+    cache._db.close()
+    assert cache.get("https://x.test/a", 60) is None
+    assert cache.broken
+    assert "Cache de respuestas desactivada" in capsys.readouterr().out
+    # ya no se toca la base de datos
+    cache.put("https://x.test/b", "https://x.test/b", 200, "b", False)
+    assert cache.conditional_headers("https://x.test/a") == {}
+    cache.close()
+
+
+def test_response_cache_pass_serves_fresh_entries():
+    site = make_site("https://x.test/{username}", not_found_markers=["no such user"])
+    cache = tyke.get_response_cache()
+    cache.put("https://x.test/ghost", "https://x.test/ghost", 200, "No such user here", False)
+    served = []
+    remaining = tyke.response_cache_pass([("ghost", site), ("alice", site)], served.append)
+    assert remaining == [("alice", site)]
+    assert [(r["username"], r["status"], r.get("cached")) for r in served] == [("ghost", "NOT_FOUND", True)]
+    assert served[0]["reason"].endswith("[cache]")
+
+
+def test_check_site_revalidates_with_304(serve):
+    seen = []
+
+    def route(handler):
+        seen.append(handler.headers.get("If-None-Match"))
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, [("ETag", '"v1"')], ""
+        return 200, [("ETag", '"v1"')], "profile of alice, followers"
+
+    base, _srv = serve(route)
+    site = make_site(base + "/u/{username}", positive_markers=["followers"])
+    first = tyke.check_site("alice", site)
+    second = tyke.check_site("alice", site)
+    assert seen == [None, '"v1"']
+    assert second["status"] == first["status"] == "EXISTS_HIGH"
+    assert "[revalidated 304]" in second["reason"]
+    assert tyke.get_response_cache().revalidated == 1
+
+
+def test_verdict_cache_roundtrip_and_invalidation(monkeypatch):
+    site = make_site("https://x.test/{username}")
+    cache = tyke.VerdictCache(data={})
+    res = tyke.make_result("alice", site, "NOT_FOUND", "HTTP 404", "https://x.test/alice", 404)
+    cache.record(res, site)
+
+    cached = cache.get("alice", site)
+    assert (cached["status"], cached["reason"], cached["cached"]) == ("NOT_FOUND", "HTTP 404 [cached]", True)
+    assert cache.get("bob", site) is None
+
+    # un resultado servido de cache no renueva la entrada
+    cached["status"] = "EXISTS_HIGH"
+    cache.record(cached, site)
+    assert cache.get("alice", site)["status"] == "NOT_FOUND"
+
+    # si cambia la plantilla del catalogo, el veredicto ya no vale
+    moved = make_site("https://x.test/users/{username}")
+    assert cache.get("alice", moved) is None
+
+    monkeypatch.setitem(tyke.VERDICT_TTL, "NOT_FOUND", -1)
+    assert cache.get("alice", site) is None
+
+
+def test_verdict_cache_skips_errors_and_persists_fresh_entries(monkeypatch):
+    site = make_site("https://x.test/{username}")
+    cache = tyke.VerdictCache(data={})
+    cache.record(tyke.make_result("alice", site, "ERROR", "timeout", "", 0), site)
+    cache.record(tyke.make_result("bob", site, "EXISTS_HIGH", "ok", "https://x.test/bob", 200), site)
+    cache.record(tyke.make_result("carol", site, "EXISTS_WEAK", "ok", "https://x.test/carol", 200), site)
+    assert cache.get("alice", site) is None
+
+    monkeypatch.setitem(tyke.VERDICT_TTL, "EXISTS_WEAK", -1)
+    cache.save()
+    reloaded = tyke.VerdictCache()
+    assert reloaded.get("bob", site)["status"] == "EXISTS_HIGH"
+    assert "t\tcarol" not in reloaded.data
+
+
+def test_verdict_cache_pass_and_no_cache(monkeypatch):
+    site = make_site("https://x.test/{username}")
+    tyke.get_verdict_cache().record(tyke.make_result("alice", site, "NOT_FOUND", "HTTP 404", "", 404), site)
+    served = []
+    assert tyke.verdict_cache_pass([("alice", site), ("bob", site)], served.append) == [("bob", site)]
+    assert [r["username"] for r in served] == ["alice"]
+
+    monkeypatch.setattr(tyke, "CACHE_REFRESH", True)
+    assert len(tyke.verdict_cache_pass([("alice", site)], served.append)) == 1
+    monkeypatch.setattr(tyke, "RESPONSE_CACHE", False)
+    assert tyke.get_verdict_cache() is None
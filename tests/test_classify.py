@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tyke  # noqa: E402
+
+
+def baseline(site, status_code, body, username, final_url):
+    """classify_result sin memo: un scan completo del body original."""
+    text = tyke.normalize_text(body)
+    not_found_hit, user_in_text, positive_hits = tyke.get_matcher(site, username).scan(text)
+    positive_hit = positive_hits[0] if positive_hits else None
+    return tyke.verdict_from_matches(status_code, username, final_url, not_found_hit, user_in_text, positive_hit)
+
+
+def make_site(not_found, positive):
+    return tyke.Site({
+        "name": "T",
+        "slug": "t",
+        "url": "https://t.example/{username}",
+        "not_found_markers": not_found,
+        "positive_markers": positive,
+    })
+
+
+def test_marker_overlapping_username_is_not_replayed():
+    tyke.BODY_MEMO = tyke.BodyMemo()
+    site = make_site([], ["followers"])
+    first = tyke.classify_result(site, 200, "Welcome followers page", "followers", "https://t.example/followers")
+    assert first[0] == "EXISTS_HIGH"
+    second = tyke.classify_result(site, 200, "Welcome  page", "zz", "https://t.example/zz")
+    assert second == baseline(site, 200, "Welcome  page", "zz", "https://t.example/zz")
+    assert second[0] == "EXISTS_WEAK"
+
+
+def test_memo_matches_baseline_fuzz():
+    rng = random.Random(7)
+    site = make_site(["page not found", "no such user", "ab", "lice"], ["followers", "joined", "bo"])
+    words = ["hello", "page not", "found", "followers", "joined", "a", "b", "li", "ce", "no such", "user", " "]
+    users = ["alice", "bob", "followers", "ab", "xbo", "zz", "lic", ""]
+    tyke.BODY_MEMO = tyke.BodyMemo()
+    for _ in range(20000):
+        username = rng.choice(users)
+        pieces = [rng.choice(words + [username]) for _ in range(rng.randint(0, 10))]
+        body = rng.choice(["", " "]).join(pieces)
+        status_code = rng.choice([200, 404, 302])
+        url = "https://t.example/" + rng.choice([username, "home"])
+        assert tyke.classify_result(site, status_code, body, username, url) == baseline(
+            site, status_code, body, username, url
+        ), (body, username)
+    assert tyke.BODY_MEMO.hits > 0
@@ -0,0 +1,36 @@
+import tyke
+from conftest import make_site
+
+WILDCARD = {"10.0.0.1"}
+
+
+def fake_lookup(host, port):
+    user = host.split(".", 1)[0]
+    if user == "ghost":
+        return set()
+    if user == "alice":
+        return {"10.0.0.2"}
+    # cualquier otra etiqueta (incluida la aleatoria) cae en el comodin
+    return set(WILDCARD)
+
+
+def run_fast_path(monkeypatch, **extra):
+    monkeypatch.setattr(tyke.DNS_CACHE, "lookup", fake_lookup)
+    site = make_site("https://{username}.x.test/", **extra)
+    jobs = [(user, site) for user in ("ghost", "alice", "nobody")]
+    decided = []
+    remaining = tyke.dns_fast_path(jobs, decided.append)
+    return {r["username"]: r["reason"] for r in decided}, [u for u, _s in remaining]
+
+
+def test_nxdomain_is_not_found(monkeypatch):
+    decided, remaining = run_fast_path(monkeypatch)
+    assert list(decided) == ["ghost"]
+    # sin dns_catch_all el comodin es ambiguo: va a HTTP
+    assert remaining == ["alice", "nobody"]
+
+
+def test_catch_all_is_opt_in(monkeypatch):
+    decided, remaining = run_fast_path(monkeypatch, dns_catch_all=True)
+    assert decided["nobody"] == "dns: catch-all IP (wildcard)"
+    assert remaining == ["alice"]
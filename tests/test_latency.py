@@ -0,0 +1,65 @@
+import json
+
+import tyke
+from conftest import make_site
+
+
+def test_few_samples_use_default_timeouts():
+    history = tyke.LatencyHistory(data={})
+    site = make_site("https://x.test/{username}")
+    assert history.timeouts(site) == (tyke.CONNECT_TIMEOUT, tyke.TIMEOUT)
+
+
+def test_read_timeout_follows_p95_within_floor_and_ceiling():
+    history = tyke.LatencyHistory(data={})
+    fast = make_site("https://fast.test/{username}", slug="fast")
+    slow = make_site("https://slow.test/{username}", slug="slow")
+    for _ in range(10):
+        history.record(fast, 0.1)
+        history.record(slow, 15.0)
+    assert history.timeouts(fast)[1] == tyke.TIMEOUT_FLOOR
+    assert history.timeouts(slow)[1] == tyke.TIMEOUT_CEILING
+
+
+def test_consecutive_connect_failures_shorten_connect_timeout():
+    history = tyke.LatencyHistory(data={})
+    site = make_site("https://x.test/{username}")
+    history.record_failure(site)
+    history.record_failure(site)
+    assert history.timeouts(site)[0] == tyke.DEAD_CONNECT_TIMEOUT
+    history.record(site, 0.2)
+    assert history.timeouts(site)[0] == tyke.CONNECT_TIMEOUT
+
+
+def test_read_timeouts_double_until_ceiling_and_reset_on_success():
+    history = tyke.LatencyHistory(data={})
+    site = make_site("https://x.test/{username}")
+    for _ in range(5):
+        history.record(site, 0.1)
+    assert history.timeouts(site)[1] == tyke.TIMEOUT_FLOOR
+
+    history.record_timeout(site, tyke.TIMEOUT_FLOOR)
+    first = history.timeouts(site)[1]
+    assert tyke.TIMEOUT_FLOOR < first < tyke.TIMEOUT_CEILING
+    history.record_timeout(site, first)
+    assert history.timeouts(site)[1] > first
+
+    history.record(site, 0.1)
+    assert history.data["t"]["timeouts"] == 0
+
+
+def test_many_read_timeouts_do_not_overflow(tmp_path):
+    history = tyke.LatencyHistory(data={})
+    site = make_site("https://tarpit.test/{username}")
+    for _ in range(1100):
+        history.record_timeout(site, tyke.TIMEOUT_CEILING)
+    assert history.timeouts(site)[1] == tyke.TIMEOUT_CEILING
+    assert history.data["t"]["timeouts"] <= tyke.TIMEOUT_DOUBLINGS
+
+    # un latency.json de una version anterior con el contador disparado
+    history.save()
+    path = tmp_path / tyke.LATENCY_FILE
+    data = json.loads(path.read_text())
+    data["t"]["timeouts"] = 5000
+    path.write_text(json.dumps(data))
+    assert tyke.LatencyHistory().timeouts(site)[1] == tyke.TIMEOUT_CEILING
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+import tyke
+
+NOT_FOUND = ["page not found", "no such user", "404", "this account doesn't exist", "gone"]
+POSITIVE = ["followers", "joined", "posts", "repositories"]
+
+
+def both_matchers(monkeypatch, username):
+    """El mismo sitio con automata Aho-Corasick y con busquedas `in`."""
+    pytest.importorskip("ahocorasick")
+    monkeypatch.setattr(tyke, "AC_MIN_NEEDLES", 1)
+    with_ac = tyke.MarkerMatcher(NOT_FOUND, POSITIVE, username)
+    monkeypatch.setattr(tyke, "ahocorasick", None)
+    plain = tyke.MarkerMatcher(NOT_FOUND, POSITIVE, username)
+    assert with_ac.automaton is not None and plain.automaton is None
+    return with_ac, plain
+
+
+def test_not_found_reason_follows_marker_order(monkeypatch):
+    with_ac, plain = both_matchers(monkeypatch, "alice")
+    # "gone" aparece antes en el body, pero "page not found" va antes en la lista
+    text = "gone. page not found"
+    assert with_ac.scan(text) == plain.scan(text) == ("page not found", False, ())
+
+
+def test_automaton_matches_plain_scan(monkeypatch):
+    with_ac, plain = both_matchers(monkeypatch, "alice")
+    rng = random.Random(3)
+    words = NOT_FOUND + POSITIVE + ["alice", "hello", "profile", " "]
+    for _ in range(5000):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 8)))
+        assert with_ac.scan(text) == plain.scan(text), text
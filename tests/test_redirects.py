@@ -0,0 +1,122 @@
+import pytest
+
+import tyke
+from conftest import make_site
+
+
+def consent_route(handler):
+    """Pone una cookie en el 302 y redirige a la misma url."""
+    if "consent=1" not in (handler.headers.get("Cookie") or ""):
+        return 302, [("Set-Cookie", "consent=1; Path=/"), ("Location", handler.path)], ""
+    return 200, [], "<h1>alice</h1> followers"
+
+
+@pytest.mark.parametrize("transport", ["requests", "http2"])
+def test_cookie_set_on_redirect_is_sent_back_within_the_probe(serve, transport):
+    if transport == "http2":
+        if tyke.httpx is None:
+            pytest.skip("httpx no instalado")
+        tyke.TRANSPORT = tyke.Http2Transport()
+    base, srv = serve(consent_route)
+    site = make_site(base + "/u/{username}", positive_markers=["followers"])
+
+    res = tyke.check_site("alice", site)
+
+    assert res["status"] == "EXISTS_HIGH"
+    assert srv.hits["/u/alice"] == 2
+    # la cookie no sobrevive a la comprobacion
+    assert len(tyke.get_http_session().cookies) == 0
+    if transport == "http2":
+        assert len(tyke.TRANSPORT.client.cookies) == 0
+        tyke.TRANSPORT.close()
+
+
+def test_cookies_do_not_leak_between_probes(serve):
+    seen = []
+
+    def route(handler):
+        seen.append(handler.headers.get("Cookie"))
+        return 200, [("Set-Cookie", "sid=1; Path=/")], "ok"
+
+    base, _srv = serve(route)
+    site = make_site(base + "/u/{username}")
+    tyke.check_site("alice", site)
+    tyke.check_site("bob", site)
+    assert seen == [None, None]
+
+
+def test_soft_404_redirect_is_not_learned():
+    memory = tyke.RedirectMemory(data={})
+    site = make_site("https://x.test/{username}")
+    for user in ("bob", "carol", "dave"):
+        memory.observe(site, user, site.format_url(user), f"https://x.test/search?q={user}")
+    assert memory.url_for(site, "alice") == "https://x.test/alice"
+
+
+def test_canonical_rewrites_are_learned():
+    site = make_site("http://x.test/u/{username}")
+    for final in ("https://www.x.test/u/{username}/", "https://x.test/en-us/u/{username}"):
+        memory = tyke.RedirectMemory(data={})
+        for user in ("bob", "carol"):
+            memory.observe(site, user, site.format_url(user), final.replace("{username}", user))
+        assert memory.url_for(site, "alice") == final.replace("{username}", "alice")
+
+
+def test_stale_entry_with_other_shape_is_ignored():
+    site = make_site("https://x.test/{username}")
+    memory = tyke.RedirectMemory(data={
+        "t": {"from": site.url, "template": "https://x.test/search?q={username}", "hits": 9},
+    })
+    assert memory.url_for(site, "alice") == "https://x.test/alice"
+
+
+def test_shortcut_is_rechecked_and_dropped_when_catalog_stops_redirecting(serve, monkeypatch):
+    monkeypatch.setattr(tyke, "RESPONSE_CACHE", False)
+    redirecting = [True]
+
+    def route(handler):
+        if handler.path.endswith("/"):
+            return 200, [], "profile"
+        if redirecting[0]:
+            return 301, [("Location", handler.path + "/")], ""
+        return 200, [], "profile"
+
+    base, srv = serve(route)
+    site = make_site(base + "/u/{username}")
+    memory = tyke.get_redirect_memory()
+
+    for i in range(tyke.REDIRECT_LEARN_MIN):
+        tyke.check_site(f"user{i}", site)
+    assert memory.url_for(site, "alice") == base + "/u/alice/"
+
+    redirecting[0] = False
+    for i in range(tyke.REDIRECT_RECHECK_EVERY):
+        user = f"again{i}"
+        tyke.check_site(user, site)
+        if srv.hits.get(f"/u/{user}"):
+            break
+    else:
+        raise AssertionError("no se volvio a pedir la url del catalogo")
+    # la url del catalogo ya no redirige: se olvida el atajo
+    assert "t" not in memory.data
+    assert memory.url_for(site, "bob") == base + "/u/bob"
+
+
+def test_preflight_and_check_request_the_same_learned_url(serve, monkeypatch):
+    monkeypatch.setattr(tyke, "RESPONSE_CACHE", False)
+
+    def route(handler):
+        if handler.path.endswith("/"):
+            return 200, [], "profile"
+        return 301, [("Location", handler.path + "/")], ""
+
+    base, srv = serve(route)
+    site = make_site(base + "/u/{username}")
+    for i in range(tyke.REDIRECT_LEARN_MIN):
+        tyke.check_site(f"user{i}", site)
+
+    res = tyke.preflight_site("alice", site)
+    assert (res["status"], res["http_status"], res["url"]) == ("PENDING", 200, base + "/u/alice/")
+    tyke.check_site("alice", site)
+    assert "/u/alice" not in srv.hits
+    assert srv.hits["/u/alice/"] == 2
@@ -0,0 +1,70 @@
+import re
+import ssl
+
+import pytest
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+import tyke
+from conftest import make_site
+
+
+@pytest.mark.parametrize("error, expected", [
+    (requests.ConnectTimeout(), "connect"),
+    (requests.ConnectionError(), "connect"),
+    (requests.ReadTimeout(), "read_timeout"),
+    (requests.ConnectionError(ReadTimeoutError(None, "/", "read timed out")), "read_timeout"),
+    (requests.exceptions.SSLError(), None),
+    (requests.exceptions.InvalidURL(), None),
+    (requests.TooManyRedirects(), None),
+])
+def test_retry_class_for_error(error, expected):
+    assert tyke.retry_class_for_error(error) == expected
+
+
+def test_httpx_certificate_failure_is_not_retried():
+    if tyke.httpx is None:
+        pytest.skip("httpx no instalado")
+    try:
+        try:
+            raise ssl.SSLCertVerificationError("certificate verify failed")
+        except ssl.SSLError as cause:
+            raise tyke.httpx.ConnectError("certificate verify failed") from cause
+    except tyke.httpx.ConnectError as e:
+        error = tyke._requests_error(e)
+    assert isinstance(error, requests.exceptions.SSLError)
+    assert tyke.retry_class_for_error(error) is None
+
+
+def flaky_probe():
+    """Falla con "connect" la primera vez de cada job."""
+    seen = set()
+
+    def probe(username, site):
+        res = tyke.make_result(username, site, "NOT_FOUND", "ok", site.format_url(username), 404)
+        if (username, site.slug) not in seen:
+            seen.add((username, site.slug))
+            res["retry_class"] = "connect"
+        return res
+
+    return probe
+
+
+@pytest.mark.parametrize("engine", ["serial", "async"])
+def test_progress_counter_does_not_count_retries(engine, monkeypatch, capsys):
+    monkeypatch.setitem(tyke.RETRY_POLICIES, "connect", {"retries": 1, "base": 0.0, "cap": 0.0})
+    sites = [make_site(f"https://h{i}.test/{{username}}", slug=f"s{i}") for i in range(3)]
+    jobs = [("alice", site) for site in sites]
+    scheduler = tyke.HostScheduler(jobs, key=tyke.job_host, limiter=tyke.HostRateLimiter(rate=1000, capacity=10))
+    results = []
+    if engine == "serial":
+        tyke.scan_serial(scheduler, len(jobs), results.append, probe=flaky_probe())
+    else:
+        tyke.scan_async(scheduler, len(jobs), results.append, concurrency=2, probe=flaky_probe())
+
+    assert len(results) == 3
+    out = capsys.readouterr().out
+    counters = [int(n) for n in re.findall(r"\[(\d+)/3\] Comprobando", out)]
+    assert len(counters) == 6
+    assert max(counters) == 3
+    assert out.count("(reintento 1)") == 3
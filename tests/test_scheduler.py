@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+import tyke
+from conftest import make_site
+
+
+def host_of(item):
+    return item[0]
+
+
+def fast_limiter(**overrides):
+    return tyke.HostRateLimiter(rate=1000.0, capacity=100, overrides=overrides)
+
+
+def result(item, retry_class=None, retry_after=None):
+    site = make_site(f"https://{item}.test/{{username}}", slug=item)
+    res = tyke.make_result("u", site, "ERROR", "HTTP 503", site.format_url("u"), 503)
+    if retry_class:
+        res["retry_class"] = retry_class
+    if retry_after:
+        res["retry_after"] = retry_after
+    return res
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = tyke.TokenBucket(rate=10.0, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_token_bucket_block_for():
+    bucket = tyke.TokenBucket(rate=10.0, capacity=5)
+    assert bucket.ready_in() == 0.0
+    bucket.block_for(3.0)
+    assert bucket.ready_in() == pytest.approx(3.0, abs=0.05)
+    assert bucket.reserve() == pytest.approx(3.0, abs=0.05)
+    # un bloqueo mas corto no acorta el que ya hay
+    bucket.block_for(0.5)
+    assert bucket.ready_in() > 3.0
+
+
+def test_rotation_interleaves_hosts():
+    items = ["a1", "a2", "a3", "b1", "c1"]
+    scheduler = tyke.HostScheduler(items, key=host_of, limiter=fast_limiter())
+    order = [scheduler.pop()[0] for _ in items]
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+    assert scheduler.pop()[0] is None
+
+
+def test_throttled_host_is_skipped_while_others_are_ready():
+    limiter = fast_limiter(a=(0.01, 1))
+    scheduler = tyke.HostScheduler(["a1", "a2", "b1", "b2"], key=host_of, limiter=limiter)
+    popped = [scheduler.pop() for _ in range(4)]
+    assert [item for item, _delay in popped] == ["a1", "b1", "b2", "a2"]
+    assert popped[-1][1] > 10
+
+
+def test_priority_picks_best_ready_head():
+    values = {"a1": 1, "b1": 5, "c1": 3}
+    scheduler = tyke.HostScheduler(["a1", "b1", "c1"], key=host_of, limiter=fast_limiter(), priority=values.get)
+    assert [scheduler.pop()[0] for _ in range(3)] == ["b1", "c1", "a1"]
+
+
+def test_retry_is_rescheduled_until_policy_is_exhausted(monkeypatch):
+    monkeypatch.setitem(tyke.RETRY_POLICIES, "5xx", {"retries": 2, "base": 0.0, "cap": 0.0})
+    scheduler = tyke.HostScheduler(["a1"], key=host_of, limiter=fast_limiter())
+
+    for attempt in range(2):
+        item, _delay = scheduler.pop()
+        assert item == "a1"
+        assert scheduler.complete(item, result(item, "5xx")) is False
+        assert scheduler.attempts[item] == attempt + 1
+
+    item, _delay = scheduler.pop()
+    res = result(item, "5xx")
+    assert scheduler.complete(item, res) is True
+    assert res["reason"] == "HTTP 503 (after 2 retries)"
+    assert "retry_class" not in res
+    assert scheduler.pop() == (None, 0.0)
+
+
+def test_pop_waits_for_inflight_and_delayed_items(monkeypatch):
+    monkeypatch.setitem(tyke.RETRY_POLICIES, "5xx", {"retries": 1, "base": 0.2, "cap": 0.2})
+    scheduler = tyke.HostScheduler(["a1"], key=host_of, limiter=fast_limiter())
+    item, _delay = scheduler.pop()
+    # en vuelo: puede volver como reintento, no se da la cola por terminada
+    assert scheduler.pop() == (None, scheduler.POLL_INTERVAL)
+    scheduler.complete(item, result(item, "5xx"))
+    none, wait = scheduler.pop()
+    assert none is None and 0 < wait <= 0.2
+    time.sleep(wait + 0.2)
+    assert scheduler.pop()[0] == "a1"
+
+
+def test_retry_after_blocks_the_host(monkeypatch):
+    monkeypatch.setitem(tyke.RETRY_POLICIES, "429", {"retries": 1, "base": 0.0, "cap": 0.0})
+    limiter = fast_limiter()
+    scheduler = tyke.HostScheduler(["a1", "a2", "b1"], key=host_of, limiter=limiter)
+    item, _delay = scheduler.pop()
+    assert scheduler.complete(item, result(item, "429", retry_after=5)) is False
+    assert limiter.bucket("a").ready_in() > 4
+    # b sigue despachando mientras a esta bloqueado
+    assert scheduler.pop()[0] == "b1"
+
+
+def test_deadline_stops_dispatch_and_final_retries():
+    deadline = time.monotonic() + 0.3
+    limiter = fast_limiter(slow=(0.01, 1))
+    scheduler = tyke.HostScheduler(["slow1", "slow2", "a1"], key=lambda i: i.rstrip("0123456789"),
+                                   limiter=limiter, deadline=deadline)
+    assert scheduler.pop()[0] == "slow1"
+    assert scheduler.pop()[0] == "a1"
+    # slow2 solo estaria listo despues del plazo: no se despacha
+    assert scheduler.pop() == (None, 0.0)
+
+    # un reintento cuyo retraso pasa del plazo es definitivo
+    res = result("a1", "429", retry_after=60)
+    assert scheduler.complete("a1", res) is True
+    time.sleep(0.35)
+    assert scheduler.expired()
+    assert scheduler.pop() == (None, 0.0)
+    assert scheduler.drain() == ["slow2"]
+
+
+def test_drain_returns_queued_and_delayed_items(monkeypatch):
+    monkeypatch.setitem(tyke.RETRY_POLICIES, "5xx", {"retries": 1, "base": 30.0, "cap": 30.0})
+    scheduler = tyke.HostScheduler(["a1", "a2", "b1"], key=host_of, limiter=fast_limiter())
+    item, _delay = scheduler.pop()
+    scheduler.complete(item, result(item, "5xx"))
+    assert sorted(scheduler.drain()) == ["a1", "a2", "b1"]
+    assert len(scheduler) == 0
+    assert scheduler.pop() == (None, 0.0)
+
+
+def test_scan_threaded_raises_without_waiting_for_the_queue():
+    sites = [make_site(f"https://h{i}.test/{{username}}", slug=f"s{i}") for i in range(40)]
+    jobs = [("alice", site) for site in sites]
+    scheduler = tyke.HostScheduler(jobs, key=tyke.job_host, limiter=fast_limiter())
+    calls = []
+    lock = threading.Lock()
+
+    def probe(username, site):
+        with lock:
+            calls.append(site.slug)
+        if site.slug == "s0":
+            raise RuntimeError("boom")
+        time.sleep(0.3)
+        return tyke.make_result(username, site, "NOT_FOUND", "ok", site.format_url(username), 404)
+
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError):
+        tyke.scan_threaded(scheduler, len(jobs), lambda res: None, workers=4, probe=probe)
+    assert time.monotonic() - t0 < 0.3
+    time.sleep(0.5)
+    # los hilos terminan lo que tenian en vuelo y no cogen mas jobs
+    assert len(calls) <= 8
+    assert len(scheduler) == 0
@@ -2,20 +2,168 @@
 import sys
 import time
 import random
+import select
+import asyncio
+import codecs
+import functools
+import hashlib
+import heapq
+import json
+import math
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.ssl_ import create_urllib3_context
 import os
 import subprocess
-from datetime import datetime
+import threading
+import queue
+import socket
+import sqlite3
+import ssl
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.message import Message
+from email.utils import parsedate_to_datetime
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urlsplit, unquote, urljoin
+from urllib.request import Request as UrlRequest
 from sites import SITES as RAW_SITES
 
+try:
+    import ahocorasick  # pyahocorasick (opcional)
+except ImportError:
+    ahocorasick = None
+
+try:
+    import dns.resolver  # dnspython (opcional, para respetar TTLs)
+except ImportError:
+    dns = None
+
+try:
+    import httpx  # httpx[http2] (opcional, transporte HTTP/2)
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
 # =========================
 # CONFIG BASICA
 # =========================
 
 TIMEOUT = 12
+
+# timeouts por sitio: connect + read. El read se adapta al historial de
+# latencia de cada sitio (p95 x factor, entre suelo y techo); TIMEOUT queda
+# como read timeout para sitios sin historial.
+ADAPTIVE_TIMEOUTS = True
+CONNECT_TIMEOUT = 6.0
+DEAD_CONNECT_TIMEOUT = 2.0   # sitios con 2+ fallos de conexion seguidos (requests, no ejecuciones)
+TIMEOUT_FACTOR = 3.0
+TIMEOUT_FLOOR = 3.0
+TIMEOUT_CEILING = 20.0
+TIMEOUT_DOUBLINGS = 3        # read timeouts seguidos que cuentan: 3.0 * 2**3 ya pasa del techo
+LATENCY_SAMPLES = 50
+LATENCY_MIN_SAMPLES = 3
 MIN_DELAY = 1.5
 MAX_DELAY = 3.5
 
+# rate limit por host (token bucket). Por defecto la misma cadencia media
+# que la pausa aleatoria clasica: 1 request cada (MIN_DELAY+MAX_DELAY)/2 s.
+HOST_RATE = 2.0 / (MIN_DELAY + MAX_DELAY)
+HOST_BURST = 1
+# overrides por host: {"github.com": (rate_por_segundo, burst)}
+HOST_RATE_OVERRIDES = {}
+
+# modo streaming: lee el body por trozos y corta en cuanto el veredicto es final
+STREAM_MODE = False
+STREAM_CHUNK_SIZE = 8192
+
+# tope de bytes de body que se descargan/guardan por request (0 = sin tope).
+# Cada sitio puede tener su propio "max_bytes" en sites.py.
+# Memoria de bodies en vuelo ~ concurrencia x tope.
+MAX_BODY_BYTES = 1024 * 1024
+
+# escaneo en dos fases: HEAD (o GET solo cabeceras) a todo, GET completo solo a candidatos
+TWO_PHASE = False
+PREFLIGHT_METHOD = "HEAD"   # "HEAD" o "GET"
+
+# transporte HTTP/2 (httpx + h2): una conexion multiplexada por origen.
+# Si no esta instalado, o hay proxies, se usa requests (HTTP/1.1).
+USE_HTTP2 = False
+
+# DNS: pre-resolucion en paralelo de todos los hosts del perfil + cache en proceso
+DNS_PREFETCH = True
+DNS_WORKERS = 32
+DNS_DEFAULT_TTL = 300      # sin dnspython no hay TTL real
+DNS_NEGATIVE_TTL = 60      # NXDOMAIN
+# sitios {username}.host: se decide NOT_FOUND por DNS antes de abrir conexiones
+DNS_FAST_PATH = True
+
+# reintentos por clase de error: backoff exponencial con jitter, respetando
+# Retry-After. El job se reprograma en el scheduler, sin bloquear workers.
+RETRY_POLICIES = {
+    "connect": {"retries": 1, "base": 2.0, "cap": 10.0},
+    "read_timeout": {"retries": 1, "base": 3.0, "cap": 15.0},
+    "429": {"retries": 3, "base": 5.0, "cap": 60.0},
+    "5xx": {"retries": 2, "base": 2.0, "cap": 20.0},
+}
+RETRY_AFTER_MAX = 120.0
+
+# redirects: se siguen a mano para aprender la url canonica de cada sitio
+# (http->https, barra final, locale...) y saltarse esos saltos en adelante.
+# Un redirect a login/home se clasifica NOT_FOUND sin descargar el destino.
+MAX_REDIRECTS = 10
+REDIRECT_LEARN_MIN = 2     # veces que se tiene que ver el mismo destino para usarlo
+REDIRECT_RECHECK_EVERY = 20   # cada N usos de un atajo se vuelve a pedir la url del catalogo
+DEAD_END_MARKERS = ("login", "signin", "sign_in", "sign-in", "signup", "/auth", "/session", "consent")
+
+# presupuesto de tiempo (segundos) para el escaneo; None = sin limite
+BUDGET = None
+# instante (time.monotonic()) en que expira el presupuesto del escaneo en curso
+SCAN_DEADLINE = None
+
+# estado persistente entre ejecuciones (estadisticas, caches...)
+STATE_DIR = os.path.expanduser("~/.tyke")
+
+# cache de respuestas en disco (SQLite en STATE_DIR), por url final.
+# Los aciertos se reclasifican con classify_result(): los marcadores nuevos aplican.
+RESPONSE_CACHE = True
+CACHE_REFRESH = False      # --refresh: no se lee la cache, pero se reescribe
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_TTL = {              # segundos por categoria
+    "default": 6 * 3600,
+    "social": 2 * 3600,
+    "creator": 2 * 3600,
+    "security": 12 * 3600,
+    "dev": 12 * 3600,
+    "business": 24 * 3600,
+}
+# veredicto ya decidido por (username, sitio): se salta la request entera.
+# Los ERROR no se guardan. --no-cache / --refresh aplican igual.
+VERDICT_TTL = {
+    "NOT_FOUND": 6 * 3600,
+    "EXISTS_WEAK": 2 * 3600,
+    "EXISTS_HIGH": 24 * 3600,
+}
+
+# pool de conexiones compartido (None = automatico segun perfil/engine)
+POOL_MAXSIZE = None   # conexiones abiertas por host
+POOL_HOSTS = None     # hosts que se mantienen en el pool
+
+# TLS: reanudacion de sesion por host (tickets) y pre-calentado de conexiones
+# hacia los hosts de los primeros jobs mientras arranca el escaneo
+TLS_RESUME = True
+PREWARM_HOSTS = 16    # 0 = sin pre-calentado
+
+# motor de escaneo: "serial" (uno a uno), "async" (asyncio + semaforo)
+# o "threads" (ThreadPoolExecutor con una Session por hilo)
+ENGINE = "serial"
+CONCURRENCY = 8
+WORKERS = 8
+
 USER_AGENTS = [
     "Mozilla/5.0 (Linux; Android 14; Mobile) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0 Safari/537.36",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
@@ -31,28 +179,63 @@ USE_TOR = False
 USE_GEONODE = False
 PROXIES_LIST = []
 
-GEONODE_URL = "https://proxylist.geonode.com/api/proxy-list?limit=500&page=1&sort_by=lastChecked&sort_type=desc"
+GEONODE_URL = "https://proxylist.geonode.com/api/proxy-list?limit=500&page={page}&sort_by=lastChecked&sort_type=desc"
+GEONODE_PAGES = 3          # paginas que se piden en paralelo
+GEONODE_TTL = 30 * 60      # segundos que vale la lista cacheada en STATE_DIR
+GEONODE_FILE = "geonode_proxies.json"
+
+
+def fetch_geonode_page(page):
+    resp = requests.get(GEONODE_URL.format(page=page), timeout=10)
+    data = resp.json()
+    proxies = []
+    for item in data.get("data", []):
+        protocols = item.get("protocols") or []
+        if "http" in protocols or "https" in protocols:
+            ip = item.get("ip")
+            port = item.get("port")
+            if ip and port:
+                proxies.append(f"http://{ip}:{port}")
+    return proxies
+
+
+def fetch_geonode_proxies(pages=None):
+    """Pide las paginas en paralelo y guarda la lista (sin duplicados) en STATE_DIR."""
+    pages = max(1, pages or GEONODE_PAGES)
+    proxies = []
+    with ThreadPoolExecutor(max_workers=pages) as pool:
+        futures = [pool.submit(fetch_geonode_page, page) for page in range(1, pages + 1)]
+        for future in futures:
+            try:
+                proxies.extend(future.result())
+            except Exception as e:
+                print(f"[*] Error cargando proxies de Geonode: {e}")
+    proxies = list(dict.fromkeys(proxies))
+    if proxies:
+        save_state(GEONODE_FILE, {"at": time.time(), "proxies": proxies})
+    return proxies
+
+
+def refresh_geonode_proxies():
+    global PROXIES_LIST
+    proxies = fetch_geonode_proxies()
+    if proxies:
+        PROXIES_LIST = proxies
 
 
 def init_geonode_proxies():
-    """Carga proxies HTTP(S) desde Geonode."""
+    """Carga proxies HTTP(S) desde Geonode.
+
+    Con la cache de disco se arranca al instante; si esta caducada se sigue
+    usando mientras un hilo en segundo plano la renueva.
+    """
     global PROXIES_LIST
-    PROXIES_LIST = []
-    try:
-        resp = requests.get(GEONODE_URL, timeout=10)
-        data = resp.json()
-        proxies = []
-        for item in data.get("data", []):
-            protocols = item.get("protocols") or []
-            if "http" in protocols or "https" in protocols:
-                ip = item.get("ip")
-                port = item.get("port")
-                if ip and port:
-                    proxies.append(f"http://{ip}:{port}")
-        PROXIES_LIST = proxies
-    except Exception as e:
-        print(f"[*] Error cargando proxies de Geonode: {e}")
-        PROXIES_LIST = []
+    cached = load_state(GEONODE_FILE)
+    PROXIES_LIST = list(cached.get("proxies") or [])
+    if not PROXIES_LIST:
+        PROXIES_LIST = fetch_geonode_proxies()
+    elif time.time() - cached.get("at", 0) > GEONODE_TTL:
+        threading.Thread(target=refresh_geonode_proxies, name="tyke-geonode", daemon=True).start()
 
 
 def pick_proxy_dict():
@@ -68,27 +251,6 @@ def pick_proxy_dict():
     return None
 
 
-# =========================
-# SITES (DEDUP)
-# =========================
-
-def build_site_list():
-    """Deduplica por slug para evitar sitios repetidos."""
-    seen = set()
-    sites = []
-    for s in RAW_SITES:
-        slug = s.get("slug") or s.get("name")
-        if not slug:
-            continue
-        if slug in seen:
-            continue
-        seen.add(slug)
-        sites.append(s)
-    return sites
-
-
-SITES = build_site_list()
-
 # =========================
 # CATEGORIAS + PESOS
 # =========================
@@ -215,7 +377,7 @@ def get_category_and_weight(slug: str):
     return cat, w
 
 
-def compute_score(slug: str, status: str):
+def compute_score(site, status: str):
     """Devuelve (score 0-100, category)."""
     if status == "EXISTS_HIGH":
         base = 70
@@ -224,11 +386,96 @@ def compute_score(slug: str, status: str):
     else:
         return 0, "other"
 
-    cat, w = get_category_and_weight(slug)
-    score = int(base * w)
+    score = int(base * site.weight)
     if score > 100:
         score = 100
-    return score, cat
+    return score, site.category
+
+
+# =========================
+# SITES (REGISTROS PRECALCULADOS + DEDUP)
+# =========================
+
+def template_host(template):
+    """Host de una plantilla url ('https://{username}.x.com/' -> 'x.com')."""
+    netloc = urlsplit(template or "").netloc.lower()
+    netloc = netloc.rsplit("@", 1)[-1].split(":", 1)[0]
+    if netloc.startswith("{username}."):
+        netloc = netloc[len("{username}."):]
+    return netloc
+
+
+class Site:
+    """Registro inmutable de un sitio; todo lo derivable se calcula una vez al importar."""
+
+    __slots__ = (
+        "name",
+        "slug",
+        "url",
+        "category",
+        "weight",
+        "host",
+        "not_found_markers",
+        "positive_markers",
+        "url_parts",
+        "max_bytes",
+        "username_in_host",
+        "dns_catch_all",
+    )
+
+    def __init__(self, raw):
+        slug = raw.get("slug") or raw.get("name")
+        category, weight = get_category_and_weight(slug)
+        template = raw.get("url") or ""
+        values = {
+            "name": raw.get("name", slug),
+            "slug": slug,
+            "url": template,
+            "category": category,
+            "weight": weight,
+            "host": template_host(template),
+            "not_found_markers": tuple(m.lower() for m in raw.get("not_found_markers", ()) if m),
+            "positive_markers": tuple(m.lower() for m in raw.get("positive_markers", ()) if m),
+            # la plantilla partida por {username}: formatear es un join
+            "url_parts": tuple(template.split("{username}")),
+            "max_bytes": raw.get("max_bytes"),
+            "username_in_host": urlsplit(template).netloc.lower().startswith("{username}."),
+            # el wildcard DNS del sitio apunta a una IP comodin: resolver a ella = no existe
+            "dns_catch_all": bool(raw.get("dns_catch_all")),
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Site es inmutable")
+
+    def __repr__(self):
+        return f"Site({self.slug!r})"
+
+    def format_url(self, username):
+        return username.join(self.url_parts)
+
+    def body_cap(self):
+        """Tope de bytes de body para este sitio (0 = sin tope)."""
+        return MAX_BODY_BYTES if self.max_bytes is None else self.max_bytes
+
+
+def build_site_list():
+    """Deduplica por slug y construye los registros Site."""
+    seen = set()
+    sites = []
+    for s in RAW_SITES:
+        slug = s.get("slug") or s.get("name")
+        if not slug:
+            continue
+        if slug in seen:
+            continue
+        seen.add(slug)
+        sites.append(Site(s))
+    return sites
+
+
+SITES = build_site_list()
 
 
 # =========================
@@ -256,18 +503,13 @@ def get_sites_for_profile(profile_name: str):
         return SITES, profile
 
     if profile == "core":
-        subset = [s for s in SITES if (s.get("slug") or s.get("name")) in CORE_SLUGS]
+        subset = [s for s in SITES if s.slug in CORE_SLUGS]
         if not subset:
             subset = SITES
         return subset, profile
 
     if profile in CATEGORY_WEIGHT.keys():
-        subset = []
-        for s in SITES:
-            slug = s.get("slug") or s.get("name")
-            cat = SLUG_CATEGORY.get(slug, "other")
-            if cat == profile:
-                subset.append(s)
+        subset = [s for s in SITES if s.category == profile]
         if not subset:
             subset = SITES
         return subset, profile
@@ -284,28 +526,107 @@ def normalize_text(text):
     return (text or "").strip().lower()
 
 
-def classify_result(site, status_code, body_text, username, final_url):
-    """Devuelve: ('NOT_FOUND' | 'EXISTS_HIGH' | 'EXISTS_WEAK', motivo)."""
-    text = normalize_text(body_text)
+# con pocos marcadores varios `in` (en C) son mas rapidos que montar el automata.
+# Ningun sitio del catalogo actual llega (el maximo son 5 needles): el automata
+# solo entra con sitios propios con muchos marcadores.
+AC_MIN_NEEDLES = 8
+
+# bodies ya vistos (sin el username) por sitio: las paginas de "no existe"
+# identicas no se vuelven a escanear
+BODY_MEMO_SIZE = 4096
+
+
+def strings_overlap(a, b):
+    """True si a y b pueden solaparse en un texto (uno contiene al otro o prefijo/sufijo comun)."""
+    if a in b or b in a:
+        return True
+    return any(a.endswith(b[:k]) or b.endswith(a[:k]) for k in range(1, min(len(a), len(b))))
+
+
+class MarkerMatcher:
+    """Marcadores de un sitio + username compilados una vez; un scan responde todo.
+
+    Si esta instalado pyahocorasick se usa un automata Aho-Corasick (una sola
+    pasada); si no, busquedas `in` sobre needles ya normalizadas.
+    """
+
+    def __init__(self, not_found_markers, positive_markers, username):
+        self.not_found_markers = tuple(dict.fromkeys(m for m in not_found_markers if m))
+        self.positive_markers = tuple(dict.fromkeys(m for m in positive_markers if m))
+        self.user_l = username or ""
+
+        needles = list(dict.fromkeys(self.not_found_markers + self.positive_markers + ((self.user_l,) if self.user_l else ())))
+        self.max_len = max((len(n) for n in needles), default=0)
+        self._not_found_set = frozenset(self.not_found_markers)
+        # la memo por body sin username solo es exacta si ningun marcador puede
+        # solaparse con una aparicion del username
+        markers = self.not_found_markers + self.positive_markers
+        self.memo_safe = not any(strings_overlap(m, self.user_l) for m in markers) if self.user_l else True
+
+        self.automaton = None
+        if ahocorasick is not None and len(needles) >= AC_MIN_NEEDLES:
+            automaton = ahocorasick.Automaton()
+            for needle in needles:
+                automaton.add_word(needle, needle)
+            automaton.make_automaton()
+            self.automaton = automaton
+
+    def scan(self, text):
+        """Sobre texto en minusculas devuelve (not_found_hit, user_in_text, positive_hits).
+
+        Un marcador de "no existe" decide el veredicto, asi que corta el scan.
+        Con varios, el que se reporta es el primero en orden de marcadores (no
+        de aparicion en el body), con automata o sin el.
+        """
+        if self.automaton is not None:
+            found = set()
+            for _end, needle in self.automaton.iter(text):
+                if needle in self._not_found_set:
+                    return self._first_not_found(text, needle), False, ()
+                found.add(needle)
+            positive_hits = tuple(m for m in self.positive_markers if m in found)
+            return None, bool(self.user_l) and self.user_l in found, positive_hits
+
+        for marker in self.not_found_markers:
+            if marker in text:
+                return marker, False, ()
+        positive_hits = tuple(m for m in self.positive_markers if m in text)
+        return None, bool(self.user_l) and self.user_l in text, positive_hits
+
+    def _first_not_found(self, text, hit):
+        """Primer marcador de "no existe" presente en el texto; `hit` ya lo esta."""
+        for marker in self.not_found_markers:
+            if marker == hit or marker in text:
+                return marker
+        return hit
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_matcher(not_found_markers, positive_markers, user_l):
+    return MarkerMatcher(not_found_markers, positive_markers, user_l)
+
+
+def get_matcher(site, username):
+    """MarkerMatcher cacheado por (marcadores del sitio, username)."""
+    return _compile_matcher(site.not_found_markers, site.positive_markers, (username or "").lower())
+
+
+def verdict_from_matches(status_code, username, final_url, not_found_hit, user_in_text, positive_hit):
+    """Veredicto a partir de lo encontrado en el body (mismas reglas que classify_result)."""
     user_l = (username or "").lower()
     url_l = (final_url or "").lower()
 
-    not_found_markers = [m.lower() for m in site.get("not_found_markers", [])]
-    positive_markers = [m.lower() for m in site.get("positive_markers", [])]
-
-    for marker in not_found_markers:
-        if marker and marker in text:
-            return "NOT_FOUND", f'matched not_found marker "{marker}"'
+    if not_found_hit:
+        return "NOT_FOUND", f'matched not_found marker "{not_found_hit}"'
 
     if status_code in (404, 410):
         return "NOT_FOUND", f"HTTP {status_code}"
 
-    if user_l and (user_l not in text and user_l not in url_l):
+    if user_l and (not user_in_text and user_l not in url_l):
         return "NOT_FOUND", "username not present in page or url"
 
-    for marker in positive_markers:
-        if marker and marker in text:
-            return "EXISTS_HIGH", f'matched positive marker "{marker}"'
+    if positive_hit:
+        return "EXISTS_HIGH", f'matched positive marker "{positive_hit}"'
 
     if status_code == 200:
         return "EXISTS_WEAK", "HTTP 200 with username present"
@@ -313,6 +634,491 @@ def classify_result(site, status_code, body_text, username, final_url):
     return "EXISTS_WEAK", f"HTTP {status_code} with username present"
 
 
+class BodyMemo:
+    """LRU acotado (sitio, hash del body sin el username) -> marcadores encontrados."""
+
+    def __init__(self, maxsize=BODY_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+BODY_MEMO = BodyMemo()
+
+
+def classify_result(site, status_code, body_text, username, final_url):
+    """Devuelve: ('NOT_FOUND' | 'EXISTS_HIGH' | 'EXISTS_WEAK', motivo)."""
+    text = normalize_text(body_text)
+    user_l = (username or "").lower()
+    matcher = get_matcher(site, username)
+    if not matcher.memo_safe:
+        not_found_hit, user_in_text, positive_hits = matcher.scan(text)
+        positive_hit = positive_hits[0] if positive_hits else None
+        return verdict_from_matches(status_code, username, final_url, not_found_hit, user_in_text, positive_hit)
+
+    # sin el username, la misma pagina de error da el mismo hash para todos.
+    # La clave lleva tambien donde estaba el username: asi dos bodies con la
+    # misma clave solo difieren en el username, que no toca ningun marcador.
+    parts = text.split(user_l) if user_l else [text]
+    stripped = "".join(parts)
+    user_in_text = len(parts) > 1
+    digest = hashlib.blake2b(stripped.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    key = (site.slug, digest, tuple(len(p) for p in parts[:-1]))
+    entry = BODY_MEMO.get(key)
+    if entry is None:
+        not_found_hit, _user_in_text, positive_hits = matcher.scan(text)
+        entry = (not_found_hit, positive_hits[0] if positive_hits else None)
+        BODY_MEMO.put(key, entry)
+    not_found_hit, positive_hit = entry
+    return verdict_from_matches(status_code, username, final_url, not_found_hit, user_in_text, positive_hit)
+
+
+class StreamClassifier:
+    """Clasificador incremental: se alimenta con trozos del body y avisa cuando el veredicto ya no puede cambiar."""
+
+    def __init__(self, site, status_code, username, final_url):
+        self.status_code = status_code
+        self.username = username
+        self.final_url = final_url
+        self.user_l = (username or "").lower()
+        self.matcher = get_matcher(site, username)
+        self.not_found_markers = self.matcher.not_found_markers
+        self.positive_markers = self.matcher.positive_markers
+
+        # se guarda la cola del trozo anterior para no perder marcadores partidos
+        self.overlap = max(self.matcher.max_len - 1, 0)
+        self.tail = ""
+        self.not_found_hit = None
+        self.positive_hits = set()
+        self.user_in_text = False
+        self.bytes_read = 0
+        self.done = status_code in (404, 410)
+
+    def feed(self, chunk, nbytes=0):
+        """Procesa un trozo de texto; devuelve True si el veredicto es final."""
+        self.bytes_read += nbytes or len(chunk)
+        if self.done:
+            return True
+
+        window = self.tail + chunk.lower()
+        not_found_hit, user_in_text, positive_hits = self.matcher.scan(window)
+        if not_found_hit:
+            self.not_found_hit = not_found_hit
+            self.done = True
+            return True
+
+        self.user_in_text = self.user_in_text or user_in_text
+        self.positive_hits.update(positive_hits)
+
+        self.tail = window[-self.overlap:] if self.overlap else ""
+
+        # sin marcadores de "no existe" solo puede cambiar la parte positiva
+        if not self.not_found_markers:
+            user_known = not self.user_l or self.user_in_text or self.user_l in (self.final_url or "").lower()
+            if user_known and (not self.positive_markers or self.positive_hits):
+                self.done = True
+        return self.done
+
+    def result(self):
+        positive_hit = next((m for m in self.positive_markers if m in self.positive_hits), None)
+        return verdict_from_matches(
+            self.status_code,
+            self.username,
+            self.final_url,
+            self.not_found_hit,
+            self.user_in_text,
+            positive_hit,
+        )
+
+
+def body_decoder(resp):
+    """Decoder incremental segun el charset de la respuesta (utf-8 si no se conoce)."""
+    try:
+        return codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def iter_capped(resp, max_bytes):
+    """Itera el body en trozos sin pasar de max_bytes; el ultimo valor es None si se trunco."""
+    read = 0
+    for raw in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        if max_bytes:
+            remaining = max_bytes - read
+            if len(raw) > remaining:
+                if remaining > 0:
+                    yield raw[:remaining]
+                yield None
+                return
+        read += len(raw)
+        yield raw
+
+
+def read_body(resp, max_bytes):
+    """Lee el body (stream=True) hasta max_bytes; devuelve (texto, truncado)."""
+    chunks = []
+    truncated = False
+    for raw in iter_capped(resp, max_bytes):
+        if raw is None:
+            truncated = True
+            break
+        chunks.append(raw)
+    decoder = body_decoder(resp)
+    return decoder.decode(b"".join(chunks), final=True), truncated
+
+
+def classify_stream(resp, site, username, max_bytes=None):
+    """Lee resp (stream=True) por trozos hasta tener veredicto final o llegar al tope de bytes.
+
+    Devuelve (status, motivo, truncado).
+    """
+    max_bytes = site.body_cap() if max_bytes is None else max_bytes
+    matcher = StreamClassifier(site, resp.status_code, username, resp.url)
+    decoder = body_decoder(resp)
+    truncated = False
+
+    if not matcher.done:
+        for raw in iter_capped(resp, max_bytes):
+            if raw is None:
+                truncated = True
+                break
+            if matcher.feed(decoder.decode(raw), len(raw)):
+                break
+        else:
+            matcher.feed(decoder.decode(b"", final=True))
+
+    status, reason = matcher.result()
+    return status, reason, truncated
+
+
+# =========================
+# TRANSPORTE (REQUESTS / HTTP2)
+# =========================
+#
+# check_site() y preflight_site() hablan con un transporte: request() devuelve
+# un objeto con la interfaz de requests.Response que usa el clasificador
+# (status_code, url, headers, encoding, elapsed, iter_content, close) y
+# lanza excepciones de requests.
+
+class RequestsTransport:
+    """HTTP/1.1 via requests (pool compartido o Session por hilo)."""
+
+    name = "http/1.1"
+
+    def request(self, method, url, headers=None, timeout=None, allow_redirects=True, proxies=None, stream=True):
+        return get_http_session().request(
+            method,
+            url,
+            headers=headers,
+            timeout=timeout,
+            allow_redirects=allow_redirects,
+            proxies=proxies,
+            stream=stream,
+        )
+
+    def close(self):
+        pass
+
+
+def _requests_error(e):
+    """Traduce una excepcion de httpx a la equivalente de requests."""
+    if isinstance(e, httpx.ConnectTimeout):
+        return requests.ConnectTimeout(str(e))
+    if isinstance(e, httpx.TimeoutException):
+        return requests.ReadTimeout(str(e))
+    if isinstance(e, (httpx.ConnectError, httpx.NetworkError)):
+        cause = e
+        while cause is not None:
+            if isinstance(cause, ssl.SSLError):
+                return requests.exceptions.SSLError(str(e))
+            cause = cause.__cause__ or cause.__context__
+        return requests.ConnectionError(str(e))
+    return requests.RequestException(str(e))
+
+
+class Http2Response:
+    """Adapta httpx.Response a lo que el resto de tyke espera de requests.Response."""
+
+    def __init__(self, resp, elapsed):
+        self._resp = resp
+        self.status_code = resp.status_code
+        self.url = str(resp.url)
+        self.headers = resp.headers
+        self.encoding = resp.charset_encoding
+        self.elapsed = timedelta(seconds=elapsed)
+        self.http_version = resp.http_version
+
+    @property
+    def num_bytes_downloaded(self):
+        return self._resp.num_bytes_downloaded
+
+    def iter_content(self, chunk_size=8192):
+        try:
+            yield from self._resp.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise _requests_error(e) from e
+
+    def close(self):
+        self._resp.close()
+
+
+class Http2Transport:
+    """HTTP/2 via httpx: las requests al mismo origen comparten una conexion.
+
+    Con proxies, o si la conexion HTTP/2 falla a nivel de protocolo, la
+    request se repite por el transporte de requests.
+    """
+
+    name = "http/2"
+
+    def __init__(self, max_connections=100):
+        self.client = httpx.Client(
+            http2=True,
+            cookies=cookieless_jar(),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.fallback = RequestsTransport()
+
+    def request(self, method, url, headers=None, timeout=None, allow_redirects=True, proxies=None, stream=True):
+        if proxies:
+            return self.fallback.request(method, url, headers, timeout, allow_redirects, proxies, stream)
+
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        t0 = time.monotonic()
+        try:
+            req = self.client.build_request(
+                method,
+                url,
+                headers=headers,
+                timeout=httpx.Timeout(connect=connect, read=read, write=read, pool=read),
+            )
+            resp = self.client.send(req, stream=True, follow_redirects=allow_redirects)
+        except (httpx.RemoteProtocolError, httpx.LocalProtocolError, httpx.UnsupportedProtocol):
+            return self.fallback.request(method, url, headers, timeout, allow_redirects, proxies, stream)
+        except httpx.HTTPError as e:
+            raise _requests_error(e) from e
+        return Http2Response(resp, time.monotonic() - t0)
+
+    def close(self):
+        self.client.close()
+
+
+def response_wire_bytes(resp):
+    """Bytes de body recibidos por la red (antes de descomprimir) hasta ahora."""
+    if isinstance(resp, Http2Response):
+        return resp.num_bytes_downloaded
+    try:
+        return int(resp.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+TRANSPORT = None
+
+
+def get_transport():
+    global TRANSPORT
+    if TRANSPORT is None:
+        TRANSPORT = RequestsTransport()
+    return TRANSPORT
+
+
+def init_transport(max_connections):
+    """Elige el transporte segun USE_HTTP2 y lo que este instalado."""
+    global TRANSPORT
+    if USE_HTTP2 and httpx is not None:
+        TRANSPORT = Http2Transport(max_connections=max_connections)
+    else:
+        if USE_HTTP2:
+            print("[*] httpx[http2] no esta instalado (pip3 install 'httpx[http2]'); usando HTTP/1.1.")
+        TRANSPORT = RequestsTransport()
+    return TRANSPORT
+
+
+# =========================
+# DNS (PRE-RESOLUCION + CACHE)
+# =========================
+
+NXDOMAIN_ERRNOS = {getattr(socket, "EAI_NONAME", -2), getattr(socket, "EAI_NODATA", -5)}
+
+
+class DnsCache:
+    """Cache de socket.getaddrinfo con TTL; una vez instalada la usa urllib3/requests."""
+
+    def __init__(self):
+        self._entries = {}  # clave getaddrinfo -> (expira, resultado | gaierror)
+        self._missing = {}  # host -> expira (NXDOMAIN)
+        self._lock = threading.Lock()
+        self._orig_getaddrinfo = socket.getaddrinfo
+        self.installed = False
+
+    def install(self):
+        if not self.installed:
+            socket.getaddrinfo = self.getaddrinfo
+            self.installed = True
+
+    def uninstall(self):
+        if self.installed:
+            socket.getaddrinfo = self._orig_getaddrinfo
+            self.installed = False
+
+    def _ttl(self, host):
+        if dns is None:
+            return DNS_DEFAULT_TTL
+        try:
+            return max(1, dns.resolver.resolve(host, "A").rrset.ttl)
+        except Exception:
+            return DNS_DEFAULT_TTL
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            if isinstance(entry[1], socket.gaierror):
+                raise entry[1]
+            return entry[1]
+
+        try:
+            result = self._orig_getaddrinfo(host, port, family, type, proto, flags)
+        except socket.gaierror as e:
+            if e.errno in NXDOMAIN_ERRNOS:
+                with self._lock:
+                    self._entries[key] = (now + DNS_NEGATIVE_TTL, e)
+                    self._missing[host] = now + DNS_NEGATIVE_TTL
+            raise
+        ttl = self._ttl(host) if isinstance(host, str) else DNS_DEFAULT_TTL
+        with self._lock:
+            self._entries[key] = (now + ttl, result)
+            self._missing.pop(host, None)
+        return result
+
+    def lookup(self, host, port):
+        """IPs de host (set vacio si NXDOMAIN, None si fallo por otra causa)."""
+        from urllib3.util.connection import allowed_gai_family
+
+        try:
+            infos = self.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            return set() if self.is_missing(host) else None
+        return {info[4][0] for info in infos}
+
+    def is_missing(self, host):
+        """True si el host dio NXDOMAIN y la respuesta negativa sigue vigente."""
+        with self._lock:
+            expires = self._missing.get(host)
+        return expires is not None and expires > time.monotonic()
+
+    def prefetch(self, addresses, workers=None):
+        """Resuelve en paralelo [(host, port), ...]; devuelve cuantos dieron NXDOMAIN."""
+        from urllib3.util.connection import allowed_gai_family
+
+        family = allowed_gai_family()
+
+        def resolve(address):
+            try:
+                self.getaddrinfo(address[0], address[1], family, socket.SOCK_STREAM)
+            except (socket.gaierror, UnicodeError):
+                pass
+
+        with ThreadPoolExecutor(max_workers=max(1, workers or DNS_WORKERS)) as pool:
+            list(pool.map(resolve, addresses))
+        return sum(1 for host, _port in addresses if self.is_missing(host))
+
+
+DNS_CACHE = DnsCache()
+
+
+def url_address(url):
+    """(host, port) al que conecta una url."""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return (parts.hostname or "", port)
+
+
+def dns_missing(url):
+    """True si el host de la url ya se sabe inexistente (solo con la cache DNS activa)."""
+    return DNS_CACHE.installed and DNS_CACHE.is_missing(url_address(url)[0])
+
+
+def prefetch_dns(jobs):
+    """Instala la cache DNS y pre-resuelve en paralelo los hosts de los jobs."""
+    DNS_CACHE.install()
+    addresses = sorted({url_address(site.format_url(username)) for username, site in jobs if site.url})
+    t0 = time.monotonic()
+    nxdomain = DNS_CACHE.prefetch(addresses)
+    print(f"[*] DNS: {len(addresses)} hosts pre-resueltos en {time.monotonic() - t0:.2f}s ({nxdomain} NXDOMAIN)\n")
+
+
+def dns_fast_path(jobs, on_result):
+    """Decide por DNS los jobs de sitios {username}.host, en paralelo.
+
+    NXDOMAIN del subdominio -> NOT_FOUND. Si el sitio declara dns_catch_all y
+    el subdominio resuelve exactamente a las IPs de una etiqueta aleatoria
+    (el comodin), tambien NOT_FOUND. Cualquier otro caso es ambiguo y el job
+    se devuelve para comprobarlo por HTTP.
+
+    dns_catch_all es opt-in y ningun sitio del catalogo lo declara: itch.io,
+    tumblr y bandcamp tienen DNS comodin que apunta al mismo frontend que los
+    usuarios reales, asi que con ellos esta fase no decide nada y todo va a HTTP.
+    """
+    candidates = [job for job in jobs if job[1].username_in_host]
+    if not candidates:
+        return jobs
+
+    targets = {}
+    probes = {}
+    for username, site in candidates:
+        address = url_address(site.format_url(username))
+        targets[(username, site.slug)] = address
+        if site.dns_catch_all and site.host not in probes:
+            probes[site.host] = (f"tyke-{random.getrandbits(48):012x}.{site.host}", address[1])
+
+    addresses = sorted(set(targets.values()) | set(probes.values()))
+    with ThreadPoolExecutor(max_workers=max(1, DNS_WORKERS)) as pool:
+        resolved = dict(zip(addresses, pool.map(lambda a: DNS_CACHE.lookup(*a), addresses)))
+    catch_all = {host: resolved[address] for host, address in probes.items()}
+
+    remaining = []
+    decided = 0
+    for job in jobs:
+        username, site = job
+        address = targets.get((username, site.slug))
+        ips = resolved.get(address) if address else None
+        reason = None
+        if ips is not None and not ips:
+            reason = "dns: NXDOMAIN (subdominio inexistente)"
+        elif ips and site.dns_catch_all and ips == catch_all.get(site.host):
+            reason = "dns: catch-all IP (wildcard)"
+        if reason is None:
+            remaining.append(job)
+            continue
+        res = make_result(username, site, "NOT_FOUND", reason, site.format_url(username), 0)
+        print_result(res)
+        on_result(res)
+        decided += 1
+
+    print(f"[*] DNS fast path: {decided}/{len(candidates)} comprobaciones {{username}}.host resueltas sin HTTP\n")
+    return remaining
+
+
 # =========================
 # REQUEST + CHEQUEO
 # =========================
@@ -321,84 +1127,1606 @@ def pick_user_agent():
     return random.choice(USER_AGENTS)
 
 
-def check_site(username, site):
-    slug = site.get("slug") or site.get("name", "unknown")
-    display_name = site.get("name", slug)
-    template = site.get("url")
-    if not template:
-        reason = "missing url template"
-        print(f"[{slug}] ERROR   -> <no-url> :: {reason}")
+class TlsSessionStore:
+    """Ultima sesion TLS de cada host; los handshakes siguientes la reanudan."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+
+    def get(self, host):
+        with self._lock:
+            return self._sessions.get(host)
+
+    def remember(self, host, sock):
+        """Guarda la sesion del socket si ya trae ticket; devuelve si se guardo."""
+        try:
+            session = sock.session
+        except (OSError, ValueError):
+            return False
+        if host and session is not None and session.has_ticket:
+            with self._lock:
+                self._sessions[host] = session
+            return True
+        return False
+
+    def handshake_done(self, host, sock):
+        with self._lock:
+            self.handshakes += 1
+            if sock.session_reused:
+                self.resumed += 1
+        self.remember(host, sock)
+
+
+TLS_SESSIONS = TlsSessionStore()
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    # con TLS 1.3 el ticket llega despues del handshake: se guarda en cuanto
+    # se procesa (primera lectura de la respuesta) y, por si acaso, al cerrar
+    _ticket_saved = False
+
+    def recv_into(self, buffer, nbytes=None, flags=0):
+        n = super().recv_into(buffer, nbytes, flags)
+        if not self._ticket_saved:
+            self._ticket_saved = TLS_SESSIONS.remember(self.server_hostname, self)
+        return n
+
+    def close(self):
+        TLS_SESSIONS.remember(self.server_hostname, self)
+        super().close()
+
+
+def read_post_handshake(sock, wait=0.25):
+    """Consume los records que el servidor manda tras el handshake (tickets de TLS 1.3).
+
+    Si se quedan sin leer, urllib3 ve el socket legible al sacarlo del pool,
+    lo da por caido y repite el handshake. Devuelve False si la conexion no
+    se puede reutilizar (cerrada por el servidor o con datos inesperados).
+    """
+    if not isinstance(sock, ssl.SSLSocket) or sock.version() != "TLSv1.3":
+        return True
+    timeout = sock.gettimeout()
+    sock.settimeout(0)
+    try:
+        while select.select([sock], [], [], wait)[0]:
+            try:
+                sock.recv(1)
+                return False  # datos de aplicacion o EOF: no se puede reutilizar
+            except ssl.SSLWantReadError:
+                # solo habia records de control: se sigue por si llega otro ticket
+                wait = 0.02
+        if not getattr(sock, "_ticket_saved", True):
+            sock._ticket_saved = TLS_SESSIONS.remember(sock.server_hostname, sock)
+        return True
+    finally:
+        sock.settimeout(timeout)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSLContext que ofrece al servidor la ultima sesion conocida de cada host."""
+
+    sslsocket_class = ResumingSSLSocket
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        if session is None and server_hostname:
+            session = TLS_SESSIONS.get(server_hostname)
+        ssock = super().wrap_socket(
+            sock,
+            server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname,
+            session=session,
+        )
+        if do_handshake_on_connect:
+            TLS_SESSIONS.handshake_done(server_hostname, ssock)
+        return ssock
+
+
+def build_ssl_context():
+    """Como el contexto por defecto de urllib3, pero con tickets de sesion."""
+    base = create_urllib3_context()
+    ctx = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.options = base.options & ~ssl.OP_NO_TICKET
+    ctx.minimum_version = base.minimum_version
+    ctx.post_handshake_auth = base.post_handshake_auth
+    return ctx
+
+
+class TlsAdapter(HTTPAdapter):
+    """HTTPAdapter cuyas conexiones directas comparten un SSLContext."""
+
+    def __init__(self, ssl_context=None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+
+def cookieless_jar(jar_class=CookieJar):
+    """CookieJar que rechaza todas las cookies.
+
+    La Session se comparte entre usernames: una cookie de sesion o de
+    consentimiento de un sitio no debe afectar al siguiente username.
+    """
+    return jar_class(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+def new_session():
+    sess = requests.Session()
+    sess.cookies = cookieless_jar(requests.cookies.RequestsCookieJar)
+    return sess
+
+
+class ConnectionPool:
+    """Session + HTTPAdapter compartidos durante toda la ejecucion."""
+
+    def __init__(self, hosts=10, maxsize=10, tls_resume=False):
+        self.session = new_session()
+        self.adapter = TlsAdapter(
+            ssl_context=build_ssl_context() if tls_resume else None,
+            pool_connections=max(1, hosts),
+            pool_maxsize=max(1, maxsize),
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def prewarm(self, url):
+        """Abre (TCP + TLS) una conexion a la url y la deja libre en el pool."""
+        # mismos ajustes que Session.request (REQUESTS_CA_BUNDLE, proxies del
+        # entorno...) para que la conexion caiga en el pool que se va a usar
+        settings = self.session.merge_environment_settings(url, {}, None, None, None)
+        prep = requests.Request("GET", url).prepare()
+        pool = self.adapter.get_connection_with_tls_context(prep, settings["verify"], settings["proxies"])
+        self.adapter.cert_verify(pool, url, settings["verify"], None)
+        conn = pool._get_conn()
+        try:
+            conn.timeout = CONNECT_TIMEOUT
+            conn.connect()
+            if not read_post_handshake(conn.sock):
+                conn.close()
+        except Exception:
+            conn.close()
+        finally:
+            pool._put_conn(conn)
+
+    def _managers(self):
+        return [self.adapter.poolmanager] + list(self.adapter.proxy_manager.values())
+
+    def stats(self):
+        """Conexiones reutilizadas (hits) vs abiertas de nuevo (misses)."""
+        total_requests = 0
+        total_connections = 0
+        for manager in self._managers():
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
         return {
-            "username": username,
-            "site": slug,
-            "name": display_name,
-            "status": "ERROR",
-            "reason": reason,
-            "url": "",
-            "http_status": 0,
-            "score": 0,
-            "category": "other",
+            "hits": max(0, total_requests - total_connections),
+            "misses": total_connections,
         }
 
-    url = template.format(username=username)
+    def close(self):
+        self.session.close()
+
+
+HTTP_POOL = None
+
+_thread_state = threading.local()
+
 
-    headers = {
+def prewarm_connections(jobs, count, skip=0):
+    """Pre-calienta en segundo plano las conexiones a los primeros `count` hosts de jobs.
+
+    Los `skip` primeros hosts los abre el primer lote de requests: pre-calentarlos
+    solo abriria una conexion de mas.
+    """
+    origins = []
+    seen = set()
+    for username, site in jobs:
+        if len(origins) >= count:
+            break
+        url = site.format_url(username)
+        origin = url_address(url)
+        if site.url and origin not in seen and not dns_missing(url):
+            seen.add(origin)
+            if len(seen) > skip:
+                origins.append(url)
+    if not origins or HTTP_POOL is None:
+        return None
+
+    def run():
+        with ThreadPoolExecutor(max_workers=min(len(origins), DNS_WORKERS)) as pool:
+            list(pool.map(HTTP_POOL.prewarm, origins))
+
+    thread = threading.Thread(target=run, name="tyke-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_http_session():
+    """Session del pool compartido si existe; si no, una Session propia por hilo."""
+    if HTTP_POOL is not None:
+        return HTTP_POOL.session
+    sess = getattr(_thread_state, "session", None)
+    if sess is None:
+        sess = new_session()
+        _thread_state.session = sess
+    return sess
+
+
+def build_headers():
+    return {
         "User-Agent": pick_user_agent(),
         "Accept-Language": "en-US,en;q=0.8",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        # gzip/deflate siempre; br y zstd solo si estan instalados brotli/zstandard
+        "Accept-Encoding": ACCEPT_ENCODING,
+    }
+
+
+def make_result(username, site, status, reason, url, http_status, nbytes=0):
+    """Dict de resultado comun a todos los caminos (score/categoria incluidos)."""
+    score, category = compute_score(site, status)
+    return {
+        "username": username,
+        "site": site.slug,
+        "name": site.name,
+        "status": status,
+        "reason": reason,
+        "url": url,
+        "http_status": http_status,
+        "score": score,
+        "category": category,
+        "bytes": nbytes,
     }
 
+
+def format_bytes(n):
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f} MiB"
+    if n >= 1024:
+        return f"{n / 1024:.1f} KiB"
+    return f"{n} B"
+
+
+def print_result(res):
+    slug = res["site"]
+    status = res["status"]
+    url = res["url"] or "<no-url>"
+    reason = res["reason"]
+    score = res["score"]
+    size = f" [{format_bytes(res['bytes'])}]" if res.get("bytes") else ""
+    if status == "NOT_FOUND":
+        print(f"[{slug}] MISS    -> {url} :: {reason}{size}")
+    elif status == "EXISTS_HIGH":
+        print(f"[{slug}] HIT *   -> {url} :: {reason} :: score={score}{size}")
+    elif status == "EXISTS_WEAK":
+        print(f"[{slug}] HIT (?) -> {url} :: {reason} :: score={score}{size}")
+    elif status == "ERROR":
+        print(f"[{slug}] ERROR   -> {url} :: {reason}{size}")
+    else:
+        print(f"[{slug}] {status} -> {url} :: {reason} :: score={score}{size}")
+
+
+def check_site(username, site):
+    if not site.url:
+        res = make_result(username, site, "ERROR", "missing url template", "", 0)
+        print_result(res)
+        return res
+
+    url = get_redirect_memory().url_for(site, username)
+    if dns_missing(url):
+        # si el username va en el host, que no resuelva significa que no existe
+        if site.username_in_host:
+            res = make_result(username, site, "NOT_FOUND", "dns: NXDOMAIN (subdominio inexistente)", url, 0)
+        else:
+            res = make_result(username, site, "ERROR", "dns: NXDOMAIN", url, 0)
+        print_result(res)
+        return res
+
+    # las entradas vigentes ya se sirvieron en response_cache_pass(); aqui solo
+    # se revalidan las caducadas y se guarda lo descargado
+    cache = get_response_cache()
+    headers = build_headers()
     proxies = pick_proxy_dict()
+    timeout = site_timeouts(site)
+    if cache is not None and not CACHE_REFRESH:
+        # entrada caducada con validadores: si no cambio, 304 sin body
+        headers.update(cache.conditional_headers(url))
 
     try:
-        resp = requests.get(
+        resp, dead_end = fetch_following_redirects(
             url,
+            username,
             headers=headers,
-            timeout=TIMEOUT,
-            allow_redirects=True,
+            timeout=timeout,
             proxies=proxies,
         )
+        if dead_end:
+            res = make_result(username, site, "NOT_FOUND", f"redirect to {dead_end}", url, 0)
+            print_result(res)
+            return res
+        get_redirect_memory().observe(site, username, url, resp.url)
         status_code = resp.status_code
-        text = resp.text
         final_url = resp.url
+        retry_class = retry_class_for_status(status_code)
+        # cerrar antes de leer todo descarta la conexion, pero ahorra el resto del body
+        nbytes = 0
+        try:
+            if retry_class:
+                # 429/5xx: el body no dice nada del usuario; se reintenta mas tarde
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                status = "ERROR"
+                reason = f"HTTP {status_code} (rate limited)" if status_code == 429 else f"HTTP {status_code}"
+                truncated = False
+            elif status_code == 304 and cache is not None:
+                # no cambio desde la ultima descarga: se reclasifica el body guardado
+                revalidated = cache.revalidate(url)
+                if revalidated is None:
+                    status, reason, truncated = "ERROR", "HTTP 304 sin entrada en cache", False
+                else:
+                    final_url, status_code, text, truncated = revalidated
+                    status, reason = classify_result(site, status_code, text, username, final_url)
+                    reason = f"{reason} [revalidated 304]"
+            elif STREAM_MODE:
+                status, reason, truncated = classify_stream(resp, site, username)
+            else:
+                text, truncated = read_body(resp, site.body_cap())
+                status, reason = classify_result(site, status_code, text, username, final_url)
+                if cache is not None:
+                    cache.put(url, final_url, status_code, text, truncated, resp.headers)
+        finally:
+            nbytes = response_wire_bytes(resp)
+            resp.close()
+        if truncated:
+            reason = f"{reason} [body truncated at {site.body_cap()} bytes]"
     except requests.RequestException as e:
-        reason = f"request error: {type(e).__name__}"
-        print(f"[{slug}] ERROR   -> {url} :: {reason}")
-        return {
-            "username": username,
-            "site": slug,
-            "name": display_name,
-            "status": "ERROR",
-            "reason": reason,
-            "url": url,
-            "http_status": 0,
-            "score": 0,
-            "category": "other",
-        }
+        if is_read_timeout(e):
+            # si lo corto el presupuesto, no dice nada de la latencia del sitio
+            if not deadline_passed():
+                get_latency_history().record_timeout(site, timeout[1])
+        elif isinstance(e, requests.ConnectionError):
+            get_latency_history().record_failure(site)
+        res = make_result(username, site, "ERROR", f"request error: {type(e).__name__}", url, 0)
+        res["retry_class"] = retry_class_for_error(e)
+        if not res["retry_class"]:
+            print_result(res)
+        return res
+
+    get_latency_history().record(site, resp.elapsed.total_seconds())
+    res = make_result(username, site, status, reason, final_url, status_code, nbytes)
+    if retry_class:
+        res["retry_class"] = retry_class
+        res["retry_after"] = retry_after
+        return res
+    print_result(res)
+    return res
 
-    status, reason = classify_result(site, status_code, text, username, final_url)
-    score, category = compute_score(slug, status)
 
-    if status == "NOT_FOUND":
-        print(f"[{slug}] MISS    -> {final_url} :: {reason}")
-    elif status == "EXISTS_HIGH":
-        print(f"[{slug}] HIT *   -> {final_url} :: {reason} :: score={score}")
-    elif status == "EXISTS_WEAK":
-        print(f"[{slug}] HIT (?) -> {final_url} :: {reason} :: score={score}")
-    else:
-        print(f"[{slug}] {status} -> {final_url} :: {reason} :: score={score}")
+# =========================
+# REDIRECTS (SEGUIMIENTO MANUAL + ATAJOS APRENDIDOS)
+# =========================
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+REDIRECTS_FILE = "redirects.json"
+
+
+def is_dead_end_redirect(target, username):
+    """True si el destino es la home o una pagina de login/consent sin el username."""
+    target_l = unquote(target).lower()
+    if (username or "").lower() in target_l:
+        return False
+    parts = urlsplit(target_l)
+    if parts.path in ("", "/") and not parts.query:
+        return True
+    return any(marker in target_l for marker in DEAD_END_MARKERS)
+
+
+def set_cookie_headers(resp):
+    """Todas las cabeceras Set-Cookie de la respuesta (requests junta las repetidas con comas)."""
+    raw = getattr(resp, "raw", None)
+    if raw is not None:
+        return raw.headers.getlist("Set-Cookie")
+    return resp.headers.get_list("set-cookie")
+
+
+class _CookieResponse:
+    """Lo minimo que CookieJar.extract_cookies necesita de una respuesta."""
+
+    def __init__(self, values):
+        self._msg = Message()
+        for value in values:
+            self._msg["Set-Cookie"] = value
+
+    def info(self):
+        return self._msg
+
+
+class ProbeCookies:
+    """Cookies de una sola comprobacion: duran lo que su cadena de redirects.
+
+    La Session compartida no guarda cookies (ver cookieless_jar); pero hay
+    sitios que ponen una cookie en el 302 y redirigen a la misma url, y sin
+    devolverla se entra en bucle.
+    """
+
+    def __init__(self):
+        self.jar = CookieJar()
+
+    def header_for(self, url):
+        req = UrlRequest(url)
+        self.jar.add_cookie_header(req)
+        return req.get_header("Cookie")
+
+    def update(self, url, resp):
+        values = set_cookie_headers(resp)
+        if values:
+            self.jar.extract_cookies(_CookieResponse(values), UrlRequest(url))
+
+
+def fetch_following_redirects(url, username, **kwargs):
+    """GET (stream) siguiendo redirects a mano.
+
+    Devuelve (resp, None) con la respuesta final, o (None, destino) si un
+    redirect lleva a login/home: ese destino no se descarga.
+    """
+    timeout = kwargs.pop("timeout", None)
+    headers = dict(kwargs.pop("headers", None) or {})
+    cookies = ProbeCookies()
+    for _ in range(MAX_REDIRECTS + 1):
+        cookie = cookies.header_for(url)
+        if cookie:
+            headers["Cookie"] = cookie
+        else:
+            headers.pop("Cookie", None)
+        # cada salto con lo que quede de presupuesto
+        resp = get_transport().request(
+            "GET", url, headers=headers, allow_redirects=False, stream=True, timeout=clamp_to_deadline(timeout), **kwargs
+        )
+        location = resp.headers.get("Location")
+        if resp.status_code not in REDIRECT_CODES or not location:
+            return resp, None
+        resp.close()
+        cookies.update(resp.url, resp)
+        target = urljoin(resp.url, location)
+        if is_dead_end_redirect(target, username):
+            return None, target
+        url = target
+    raise requests.TooManyRedirects(f"more than {MAX_REDIRECTS} redirects")
+
+
+def is_locale_segment(segment):
+    """'en', 'es-mx', 'pt_BR'..."""
+    lang, _sep, region = segment.replace("_", "-").partition("-")
+    return len(lang) == 2 and lang.isalpha() and (not region or (2 <= len(region) <= 4 and region.isalpha()))
+
+
+def redirect_shape(template):
+    """Lo que un redirect canonico no cambia de una plantilla: path y query.
+
+    Se ignoran esquema, host, barra final y un prefijo de idioma; un
+    redirect a /search?q={username} (soft-404) cambia la forma.
+    """
+    parts = urlsplit(template)
+    segments = [seg for seg in parts.path.lower().split("/") if seg]
+    if len(segments) > 1 and is_locale_segment(segments[0]):
+        segments = segments[1:]
+    return "/".join(segments), parts.query
+
+
+class RedirectMemory:
+    """Destino canonico aprendido por sitio (plantilla con {username}), persistido en STATE_DIR.
+
+    Solo se aprenden destinos con la misma forma que la url del catalogo
+    (ver redirect_shape), y cada REDIRECT_RECHECK_EVERY usos se vuelve a
+    pedir la del catalogo para confirmar el atajo o descartarlo.
+    """
+
+    def __init__(self, data=None):
+        # slug -> {"from": plantilla del catalogo, "template": destino canonico, "hits": n}
+        self.data = load_state(REDIRECTS_FILE) if data is None else data
+        # (slug, username) -> url elegida en esta ejecucion: preflight, fase 2 y
+        # reintentos piden la misma
+        self._chosen = {}
+        self._lock = threading.Lock()
+
+    def url_for(self, site, username):
+        """Url a pedir: el destino aprendido si es fiable; si no, la del catalogo."""
+        with self._lock:
+            key = (site.slug, username)
+            url = self._chosen.get(key)
+            if url is None:
+                url = site.format_url(username)
+                entry = self.data.get(site.slug)
+                if (
+                    entry
+                    and entry.get("from") == site.url
+                    and entry.get("hits", 0) >= REDIRECT_LEARN_MIN
+                    and redirect_shape(entry["template"]) == redirect_shape(site.url)
+                ):
+                    entry["uses"] = entry.get("uses", 0) + 1
+                    if entry["uses"] % REDIRECT_RECHECK_EVERY:
+                        url = username.join(entry["template"].split("{username}"))
+                self._chosen[key] = url
+            return url
+
+    def observe(self, site, username, requested_url, final_url):
+        """Registra a donde acabo la request.
+
+        Solo se aprende si el username sigue en la url y el destino tiene la
+        misma forma que la url del catalogo.
+        """
+        if not username:
+            return
+        catalog_url = site.format_url(username)
+        with self._lock:
+            entry = self.data.get(site.slug)
+            if final_url == catalog_url:
+                # el sitio ya no redirige: se olvida el atajo
+                self.data.pop(site.slug, None)
+                return
+            if final_url == requested_url and not entry:
+                return
+            if final_url.count(username) != 1:
+                return
+            template = final_url.replace(username, "{username}")
+            if redirect_shape(template) != redirect_shape(site.url):
+                return
+            if entry and entry.get("from") == site.url and entry.get("template") == template:
+                # pedir directamente el destino aprendido tambien lo confirma
+                entry["hits"] = entry.get("hits", 0) + 1
+            else:
+                self.data[site.slug] = {"from": site.url, "template": template, "hits": 1}
+
+    def save(self):
+        with self._lock:
+            data = dict(self.data)
+        save_state(REDIRECTS_FILE, data)
 
-    return {
-        "username": username,
-        "site": slug,
-        "name": display_name,
-        "status": status,
-        "reason": reason,
-        "url": final_url,
-        "http_status": status_code,
-        "score": score,
-        "category": category,
-    }
+
+REDIRECT_MEMORY = None
+
+
+def get_redirect_memory():
+    global REDIRECT_MEMORY
+    if REDIRECT_MEMORY is None:
+        REDIRECT_MEMORY = RedirectMemory()
+    return REDIRECT_MEMORY
+
+
+# =========================
+# DOS FASES (PREFLIGHT DE CABECERAS)
+# =========================
+
+
+def preflight_site(username, site):
+    """Fase 1: solo cabeceras, sin seguir redirects.
+
+    Devuelve NOT_FOUND si el status (404/410) o un redirect a home/login
+    (el mismo criterio que check_site) ya lo descartan; si no, un resultado
+    PENDING para la fase 2.
+    Los errores de red tambien quedan PENDING: la fase 2 los reporta.
+    """
+    if not site.url:
+        return make_result(username, site, "PENDING", "", "", 0)
+    # la misma url que pedira check_site (atajo de redirect incluido)
+    url = get_redirect_memory().url_for(site, username)
+    if dns_missing(url):
+        return make_result(username, site, "PENDING", "", url, 0)
+    try:
+        kwargs = dict(headers=build_headers(), timeout=clamp_to_deadline(site_timeouts(site)), allow_redirects=False, proxies=pick_proxy_dict())
+        resp = get_transport().request(PREFLIGHT_METHOD, url, stream=True, **kwargs)
+        resp.close()
+    except requests.RequestException:
+        return make_result(username, site, "PENDING", "", url, 0)
+
+    status_code = resp.status_code
+    if status_code in (404, 410):
+        res = make_result(username, site, "NOT_FOUND", f"HTTP {status_code} (preflight)", url, status_code)
+        print_result(res)
+        return res
+
+    if status_code in REDIRECT_CODES:
+        location = resp.headers.get("Location")
+        target = urljoin(resp.url, location) if location else None
+        if target and is_dead_end_redirect(target, username):
+            res = make_result(username, site, "NOT_FOUND", f"redirect to {target} (preflight)", url, status_code)
+            print_result(res)
+            return res
+
+    return make_result(username, site, "PENDING", "", url, status_code)
+
+
+# =========================
+# RATE LIMIT POR HOST
+# =========================
+
+class TokenBucket:
+    """Token bucket con reserva: reserve() consume un token y dice cuanto esperar."""
+
+    def __init__(self, rate, capacity):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def block_for(self, seconds):
+        """Nadie saca token en los proximos `seconds` (p.ej. tras un Retry-After)."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def ready_in(self):
+        """Segundos hasta que haya un token libre (sin consumirlo)."""
+        with self._lock:
+            tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+            if tokens >= 1:
+                return 0.0
+            return (1 - tokens) / self.rate
+
+
+class HostRateLimiter:
+    """Un TokenBucket por host; hosts distintos no se esperan entre si."""
+
+    def __init__(self, rate=None, capacity=None, overrides=None):
+        self.rate = HOST_RATE if rate is None else rate
+        self.capacity = HOST_BURST if capacity is None else capacity
+        self.overrides = dict(HOST_RATE_OVERRIDES if overrides is None else overrides)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            b = self._buckets.get(host)
+            if b is None:
+                rate, capacity = self.overrides.get(host, (self.rate, self.capacity))
+                b = TokenBucket(rate, capacity)
+                self._buckets[host] = b
+            return b
+
+    def reserve(self, host):
+        return self.bucket(host).reserve()
+
+
+HOST_LIMITER = None
+
+
+def get_host_limiter():
+    global HOST_LIMITER
+    if HOST_LIMITER is None:
+        HOST_LIMITER = HostRateLimiter()
+    return HOST_LIMITER
+
+
+# =========================
+# REINTENTOS
+# =========================
+
+def retry_class_for_status(status_code):
+    if status_code == 429:
+        return "429"
+    if 500 <= status_code <= 599:
+        return "5xx"
+    return None
+
+
+def is_read_timeout(e):
+    """ReadTimeout esperando cabeceras, o leyendo el body (requests lo envuelve en ConnectionError)."""
+    if isinstance(e, requests.ReadTimeout):
+        return True
+    return isinstance(e, requests.ConnectionError) and bool(e.args) and isinstance(e.args[0], ReadTimeoutError)
+
+
+# errores que no se arreglan reintentando (certificado invalido, url mal formada...)
+NON_RETRYABLE_ERRORS = (
+    requests.exceptions.SSLError,
+    requests.exceptions.InvalidURL,
+    requests.exceptions.InvalidSchema,
+    requests.exceptions.MissingSchema,
+    requests.TooManyRedirects,
+)
+
+
+def retry_class_for_error(e):
+    if isinstance(e, NON_RETRYABLE_ERRORS):
+        return None
+    if isinstance(e, requests.ConnectTimeout):
+        return "connect"
+    if is_read_timeout(e):
+        return "read_timeout"
+    if isinstance(e, requests.ConnectionError):
+        return "connect"
+    return None
+
+
+def parse_retry_after(value):
+    """Retry-After en segundos (acepta segundos o fecha HTTP); None si no hay o es invalido."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), RETRY_AFTER_MAX)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return min(max(0.0, (when - datetime.now(timezone.utc)).total_seconds()), RETRY_AFTER_MAX)
+
+
+def retry_delay(policy, attempt, retry_after=None):
+    """Backoff exponencial con jitter (mitad fija, mitad aleatoria); Retry-After manda si es mayor."""
+    backoff = min(policy["cap"], policy["base"] * (2 ** attempt))
+    delay = backoff / 2 + random.uniform(0, backoff / 2)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# =========================
+# SCHEDULER (INTERCALADO POR HOST)
+# =========================
+
+class HostScheduler:
+    """Cola por host que rota entre hosts al despachar.
+
+    pop() prefiere, en orden de rotacion, el primer host que ya tiene token en
+    su bucket; si todos estan frenados, el que antes se libera. Asi unos pocos
+    dominios con muchas entradas no paran el resto del escaneo.
+
+    Cada item despachado se cierra con complete(item, res), que puede
+    reprogramarlo (reintento) con un retraso sin ocupar ningun worker.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, items, key=None, limiter=None, priority=None, deadline=None):
+        self.key = key or (lambda item: item.host)
+        self.limiter = limiter or get_host_limiter()
+        # con priority(item) se elige, entre los hosts listos, la cabeza de mayor valor
+        self.priority = priority
+        # con deadline (time.monotonic()) pop() deja de despachar al expirar
+        self.deadline = deadline
+        self._queues = {}
+        self._rotation = []
+        self._delayed = []  # heap (listo_en, seq, item) de reintentos
+        self._seq = 0
+        self._inflight = 0
+        self.attempts = {}
+        self._lock = threading.Lock()
+        for item in items:
+            self._add(item)
+
+    def _add(self, item):
+        host = self.key(item)
+        if host not in self._queues:
+            self._queues[host] = deque()
+            self._rotation.append(host)
+        self._queues[host].append(item)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(q) for q in self._queues.values()) + len(self._delayed)
+
+    def pop(self):
+        """Devuelve (item, espera) o (None, 0) si no queda nada (o expiro el plazo).
+
+        La espera ya esta reservada en el bucket del host. (None, espera > 0)
+        significa que solo quedan reintentos pendientes o jobs en vuelo que
+        pueden reprogramarse: hay que volver a preguntar tras esa espera.
+        """
+        with self._lock:
+            if self.expired():
+                return None, 0.0
+
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._add(heapq.heappop(self._delayed)[2])
+
+            if not self._rotation:
+                if self._delayed:
+                    return None, min(self.POLL_INTERVAL * 10, self._delayed[0][0] - now)
+                if self._inflight:
+                    return None, self.POLL_INTERVAL
+                return None, 0.0
+
+            chosen = None
+            best_value = None
+            fallback = 0
+            best_wait = None
+            for pos, host in enumerate(self._rotation):
+                wait = self.limiter.bucket(host).ready_in()
+                if wait <= 0:
+                    if self.priority is None:
+                        chosen = pos
+                        break
+                    value = self.priority(self._queues[host][0])
+                    if best_value is None or value > best_value:
+                        chosen, best_value = pos, value
+                elif best_wait is None or wait < best_wait:
+                    fallback, best_wait = pos, wait
+            if chosen is None:
+                chosen = fallback
+                if self.deadline is not None and time.monotonic() + best_wait >= self.deadline:
+                    return None, 0.0
+
+            host = self._rotation.pop(chosen)
+            host_queue = self._queues[host]
+            item = host_queue.popleft()
+            if host_queue:
+                self._rotation.append(host)
+            else:
+                del self._queues[host]
+            self._inflight += 1
+            return item, self.limiter.reserve(host)
+
+    def complete(self, item, res):
+        """Cierra un item despachado. Devuelve False si se reprogramo para reintentar.
+
+        res puede traer "retry_class" (ver RETRY_POLICIES) y "retry_after";
+        se quitan del dict antes de entregarlo.
+        """
+        retry_class = res.pop("retry_class", None) if res else None
+        retry_after = res.pop("retry_after", None) if res else None
+        with self._lock:
+            self._inflight -= 1
+            policy = RETRY_POLICIES.get(retry_class)
+            attempt = self.attempts.get(item, 0)
+            delay = retry_delay(policy, attempt, retry_after) if policy else 0.0
+            final = (
+                policy is None
+                or attempt >= policy["retries"]
+                or (self.deadline is not None and time.monotonic() + delay >= self.deadline)
+            )
+            if not final:
+                self.attempts[item] = attempt + 1
+                heapq.heappush(self._delayed, (time.monotonic() + delay, self._seq, item))
+                self._seq += 1
+                if retry_after:
+                    self.limiter.bucket(self.key(item)).block_for(retry_after)
+
+        if final:
+            if attempt and res:
+                res["reason"] = f"{res['reason']} (after {attempt} retries)"
+            if retry_class and res:
+                print_result(res)
+            return True
+        print(f"[{res['site']}] RETRY   -> {res['url']} :: {res['reason']} :: reintento {attempt + 1} en {delay:.1f}s")
+        return False
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def drain(self):
+        """Saca y devuelve todo lo que no se llego a despachar (reintentos incluidos)."""
+        with self._lock:
+            left = [item for host in self._rotation for item in self._queues[host]]
+            left.extend(item for _ready, _seq, item in sorted(self._delayed))
+            self._queues = {}
+            self._rotation = []
+            self._delayed = []
+            return left
+
+
+# =========================
+# MOTORES DE ESCANEO
+# =========================
+#
+# Todos los motores consumen un HostScheduler de jobs (username, site),
+# ejecutan probe(username, site) (check_site por defecto) y llaman a
+# on_result(res) desde el hilo que despacha, en orden de llegada.
+
+def job_host(job):
+    return job[1].host
+
+
+def retry_note(attempt):
+    return f" (reintento {attempt})" if attempt else ""
+
+
+def scan_serial(scheduler, total, on_result, probe=check_site):
+    """Comprueba los jobs uno a uno, intercalando hosts y respetando su rate limit."""
+    idx = 0
+    while True:
+        job, delay = scheduler.pop()
+        if job is None:
+            if delay:
+                time.sleep(delay)
+                continue
+            return
+        username, site = job
+        time.sleep(delay)
+        # los reintentos no cuentan como comprobacion nueva
+        attempt = scheduler.attempts.get(job, 0)
+        if not attempt:
+            idx += 1
+        print(f"\n[{idx}/{total}] Comprobando {site.name} ({username})...{retry_note(attempt)}")
+        res = probe(username, site)
+        if scheduler.complete(job, res):
+            on_result(res)
+
+
+async def _scan_async(scheduler, total, concurrency, on_result, probe):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    dispatched = 0
+
+    async def worker():
+        nonlocal dispatched
+        while True:
+            job, delay = scheduler.pop()
+            if job is None:
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+                return
+            username, site = job
+            await asyncio.sleep(delay)
+            attempt = scheduler.attempts.get(job, 0)
+            if not attempt:
+                dispatched += 1
+            print(f"\n[{dispatched}/{total}] Comprobando {site.name} ({username})...{retry_note(attempt)}")
+            try:
+                res = await loop.run_in_executor(executor, probe, username, site)
+            except Exception:
+                scheduler.complete(job, None)
+                raise
+            if scheduler.complete(job, res):
+                on_result(res)
+
+    try:
+        # `concurrency` workers = como mucho `concurrency` requests en vuelo
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def scan_async(scheduler, total, on_result, concurrency=None, probe=check_site):
+    """Comprueba los jobs en paralelo (asyncio) con un maximo de `concurrency` en vuelo."""
+    concurrency = max(1, concurrency or CONCURRENCY)
+    asyncio.run(_scan_async(scheduler, total, concurrency, on_result, probe))
+
+
+def scan_threaded(scheduler, total, on_result, workers=None, probe=check_site):
+    """Reparte los jobs entre `workers` hilos."""
+    workers = max(1, workers or WORKERS)
+    done_queue = queue.Queue()
+
+    def worker():
+        try:
+            while True:
+                job, delay = scheduler.pop()
+                if job is None:
+                    if delay:
+                        time.sleep(delay)
+                        continue
+                    return
+                username, site = job
+                time.sleep(delay)
+                try:
+                    res = probe(username, site)
+                except Exception as e:
+                    scheduler.complete(job, None)
+                    done_queue.put((site, None, e))
+                    continue
+                if scheduler.complete(job, res):
+                    done_queue.put((site, res, None))
+        finally:
+            done_queue.put(None)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for _ in range(workers):
+            pool.submit(worker)
+        finished = 0
+        done = 0
+        while finished < workers:
+            item = done_queue.get()
+            if item is None:
+                finished += 1
+                continue
+            site, res, error = item
+            if error is not None:
+                # vaciar la cola primero: los hilos terminan lo que tienen en
+                # vuelo y no cogen mas jobs; no se les espera para propagar
+                scheduler.drain()
+                raise error
+            done += 1
+            print(f"[{done}/{total}] Completado {site.name} ({res['username']})")
+            on_result(res)
+    finally:
+        pool.shutdown(wait=False)
+
+
+def engine_parallelism():
+    """Requests en vuelo como mucho con el motor configurado."""
+    if ENGINE == "async":
+        return CONCURRENCY
+    if ENGINE == "threads":
+        return WORKERS
+    return 1
+
+
+def scan_jobs(scheduler, total, on_result, probe=check_site):
+    """Despacha al motor configurado (ENGINE)."""
+    if ENGINE == "async":
+        return scan_async(scheduler, total, on_result, CONCURRENCY, probe=probe)
+    if ENGINE == "threads":
+        return scan_threaded(scheduler, total, on_result, WORKERS, probe=probe)
+    return scan_serial(scheduler, total, on_result, probe=probe)
+
+
+def build_jobs(usernames, sites):
+    """Producto username x site; cada host recibe sus jobs alternando usernames."""
+    return [(username, site) for site in sites for username in usernames]
+
+
+def run_scan(usernames, sites, on_username_done=None, budget=None, two_phase=False):
+    """Escanea todos los usernames en una sola cola.
+
+    on_username_done(username, results) se llama en cuanto un username tiene
+    todos sus sitios (o al final, si el presupuesto lo dejo a medias).
+    Con budget (segundos) se despacha primero lo de mas valor y se para al
+    expirar. Con two_phase primero se hace un preflight de cabeceras y solo
+    los candidatos se descargan. Devuelve (resultados agrupados por
+    username, jobs saltados).
+    """
+    usernames = list(dict.fromkeys(usernames))
+    per_user = {u: [] for u in usernames}
+    pending = {u: len(sites) for u in usernames}
+
+    sites_by_slug = {site.slug: site for site in sites}
+    verdicts = get_verdict_cache()
+
+    def on_result(res):
+        username = res["username"]
+        if verdicts is not None:
+            verdicts.record(res, sites_by_slug[res["site"]])
+        per_user[username].append(res)
+        pending[username] -= 1
+        if pending[username] == 0 and on_username_done is not None:
+            on_username_done(username, per_user[username])
+
+    global SCAN_DEADLINE
+    jobs = build_jobs(usernames, sites)
+    deadline = None
+    values = None
+    if budget is not None:
+        deadline = time.monotonic() + budget
+        values = site_values(sites)
+        jobs.sort(key=lambda job: values[job[1].slug], reverse=True)
+
+    def make_scheduler(phase_jobs):
+        if values is None:
+            return HostScheduler(phase_jobs, key=job_host)
+        return HostScheduler(
+            phase_jobs,
+            key=job_host,
+            priority=lambda job: values[job[1].slug],
+            deadline=deadline,
+        )
+
+    SCAN_DEADLINE = deadline
+    # primero la cache de veredictos: lo que resuelve no toca ni el DNS
+    jobs = verdict_cache_pass(jobs, on_result)
+    jobs = response_cache_pass(jobs, on_result)
+    # con Tor/proxies el DNS lo resuelve el proxy: no se pre-resuelve en local
+    if DNS_PREFETCH and not USE_TOR and not USE_GEONODE:
+        prefetch_dns(jobs)
+    if DNS_FAST_PATH and DNS_CACHE.installed:
+        jobs = dns_fast_path(jobs, on_result)
+
+    # con proxies la conexion es al proxy: no hay nada que pre-calentar
+    if PREWARM_HOSTS and isinstance(get_transport(), RequestsTransport) and pick_proxy_dict() is None:
+        prewarm_connections(jobs, PREWARM_HOSTS, skip=engine_parallelism())
+
+    skipped = []
+    if two_phase:
+        # fase 1: cabeceras a todo; lo que no queda descartado pasa a la fase 2
+        by_key = {(u, s.slug): (u, s) for u, s in jobs}
+        candidates = []
+
+        def on_preflight(res):
+            if res["status"] == "PENDING":
+                candidates.append(by_key[(res["username"], res["site"])])
+            else:
+                on_result(res)
+
+        print(f"[*] Fase 1 (preflight {PREFLIGHT_METHOD}): {len(jobs)} comprobaciones")
+        scheduler = make_scheduler(jobs)
+        scan_jobs(scheduler, len(jobs), on_preflight, probe=preflight_site)
+        skipped.extend(scheduler.drain())
+        jobs = candidates
+        print(f"\n[*] Fase 2 (GET completo): {len(jobs)} candidatos")
+
+    scheduler = make_scheduler(jobs)
+    scan_jobs(scheduler, len(jobs), on_result)
+    skipped.extend(scheduler.drain())
+    SCAN_DEADLINE = None
+
+    if on_username_done is not None:
+        for username in usernames:
+            if 0 < pending[username] and per_user[username]:
+                on_username_done(username, per_user[username])
+
+    all_results = []
+    for username in usernames:
+        all_results.extend(per_user[username])
+    return all_results, skipped
+
+
+# =========================
+# PRIORIDAD (VALOR ESPERADO) + ESTADISTICAS
+# =========================
+
+SITE_STATS_FILE = "site_stats.json"
+
+
+def state_path(name):
+    return os.path.join(STATE_DIR, name)
+
+
+def load_state(name, default=None):
+    """Lee un JSON de STATE_DIR; si no existe o esta roto devuelve default."""
+    try:
+        with open(state_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {} if default is None else default
+
+
+def save_state(name, data):
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp = state_path(name) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, state_path(name))
+    except OSError as e:
+        print(f"[*] No se pudo guardar {name}: {e}")
+
+
+def site_values(sites, stats=None):
+    """Valor esperado de cada sitio (slug -> float) para ordenar por prioridad.
+
+    peso de categoria x bonus core x tasa historica de hits (suavizada).
+    """
+    stats = load_state(SITE_STATS_FILE) if stats is None else stats
+    values = {}
+    for site in sites:
+        st = stats.get(site.slug) or {}
+        hit_rate = (st.get("hits", 0) + 1) / (st.get("probes", 0) + 2)
+        core_bonus = 1.5 if site.slug in CORE_SLUGS else 1.0
+        values[site.slug] = site.weight * core_bonus * hit_rate
+    return values
+
+
+def update_site_stats(results):
+    """Acumula probes/hits por sitio para priorizar futuros escaneos."""
+    stats = load_state(SITE_STATS_FILE)
+    for r in results:
+        # los veredictos de cache ya se contaron cuando se sondearon
+        if r["status"] == "ERROR" or r.get("cached"):
+            continue
+        st = stats.setdefault(r["site"], {"probes": 0, "hits": 0})
+        st["probes"] += 1
+        if r["score"] > 0:
+            st["hits"] += 1
+    save_state(SITE_STATS_FILE, stats)
+
+
+# =========================
+# TIMEOUTS ADAPTATIVOS (HISTORIAL DE LATENCIA)
+# =========================
+
+LATENCY_FILE = "latency.json"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = max(0, min(len(ordered) - 1, int(math.ceil(pct * len(ordered))) - 1))
+    return ordered[idx]
+
+
+class LatencyHistory:
+    """Latencias (tiempo hasta cabeceras) y fallos de conexion por sitio, persistidos en STATE_DIR."""
+
+    def __init__(self, data=None):
+        # slug -> {"samples": [segundos, ...], "fails": fallos de conexion seguidos,
+        #          "timeouts": read timeouts seguidos}
+        self.data = load_state(LATENCY_FILE) if data is None else data
+        self._lock = threading.Lock()
+
+    def timeouts(self, site):
+        """(connect, read) para requests."""
+        with self._lock:
+            entry = self.data.get(site.slug) or {}
+            samples = list(entry.get("samples") or ())
+            fails = entry.get("fails", 0)
+            timeouts = entry.get("timeouts", 0)
+
+        connect = DEAD_CONNECT_TIMEOUT if fails >= 2 else CONNECT_TIMEOUT
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            read = TIMEOUT
+        else:
+            read = min(TIMEOUT_CEILING, max(TIMEOUT_FLOOR, percentile(samples, 0.95) * TIMEOUT_FACTOR))
+        if timeouts:
+            # el p95 se queda corto para este sitio: se dobla hasta que responda
+            read = max(read, min(TIMEOUT_CEILING, read * 2 ** min(timeouts, TIMEOUT_DOUBLINGS)))
+        return connect, read
+
+    def record(self, site, seconds):
+        with self._lock:
+            entry = self.data.setdefault(site.slug, {"samples": [], "fails": 0})
+            entry["samples"] = ((entry.get("samples") or []) + [round(seconds, 3)])[-LATENCY_SAMPLES:]
+            entry["fails"] = 0
+            entry["timeouts"] = 0
+
+    def record_timeout(self, site, read_timeout):
+        """Read timeout: muestra censurada (la latencia real es >= read_timeout)."""
+        with self._lock:
+            entry = self.data.setdefault(site.slug, {"samples": [], "fails": 0})
+            entry["samples"] = ((entry.get("samples") or []) + [round(read_timeout, 3)])[-LATENCY_SAMPLES:]
+            entry["timeouts"] = min(entry.get("timeouts", 0) + 1, TIMEOUT_DOUBLINGS)
+
+    def record_failure(self, site):
+        with self._lock:
+            entry = self.data.setdefault(site.slug, {"samples": [], "fails": 0})
+            entry["fails"] = entry.get("fails", 0) + 1
+
+    def save(self):
+        with self._lock:
+            data = dict(self.data)
+        save_state(LATENCY_FILE, data)
+
+
+LATENCY_HISTORY = None
+
+
+def get_latency_history():
+    global LATENCY_HISTORY
+    if LATENCY_HISTORY is None:
+        LATENCY_HISTORY = LatencyHistory()
+    return LATENCY_HISTORY
+
+
+def site_timeouts(site):
+    """Timeout (connect, read) para el sitio; fijo si ADAPTIVE_TIMEOUTS esta desactivado."""
+    if not ADAPTIVE_TIMEOUTS:
+        return CONNECT_TIMEOUT, TIMEOUT
+    return get_latency_history().timeouts(site)
+
+
+def clamp_to_deadline(timeout):
+    """Recorta (connect, read) a lo que le queda al presupuesto: lo ya en vuelo tampoco se pasa."""
+    if SCAN_DEADLINE is None or timeout is None:
+        return timeout
+    left = max(0.1, SCAN_DEADLINE - time.monotonic())
+    connect, read = timeout
+    return min(connect, left), min(read, left)
+
+
+def deadline_passed():
+    return SCAN_DEADLINE is not None and time.monotonic() >= SCAN_DEADLINE
+
+
+# =========================
+# CACHE DE RESPUESTAS (SQLITE)
+# =========================
+
+RESPONSES_FILE = "responses.sqlite"
+
+
+class ResponseCache:
+    """Bodies descargados, por url final, con TTL y expulsion LRU por tamano.
+
+    Cada fila guarda tambien la url pedida, para encontrarla antes de hacer
+    la request, y los validadores (ETag / Last-Modified) para revalidar las
+    entradas caducadas con una request condicional. El body va comprimido
+    con zlib.
+    """
+
+    def __init__(self, path, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.broken = False
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, request_url TEXT, status_code INTEGER,"
+            " body BLOB, truncated INTEGER, size INTEGER, stored_at REAL, used_at REAL,"
+            " etag TEXT, last_modified TEXT)"
+        )
+        # caches creadas antes de guardar validadores
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_request_url ON responses(request_url)")
+
+    def _find(self, url):
+        return self._db.execute(
+            "SELECT url, status_code, body, truncated, stored_at, etag, last_modified FROM responses"
+            " WHERE request_url = ? OR url = ? ORDER BY stored_at DESC LIMIT 1",
+            (url, url),
+        ).fetchone()
+
+    def _guarded(self, default, op, *args):
+        """Ejecuta op con el lock. Un error de SQLite (p.ej. "database is locked")
+        desactiva la cache para el resto de la ejecucion en vez de tumbar el escaneo."""
+        if self.broken:
+            return default
+        try:
+            with self._lock:
+                return op(*args)
+        except sqlite3.Error as e:
+            self.broken = True
+            print(f"[*] Cache de respuestas desactivada: {e}")
+            return default
+
+    def get(self, url, ttl):
+        """(url final, status, texto, truncado) si hay una entrada vigente; si no None."""
+        return self._guarded(None, self._get, url, ttl)
+
+    def _get(self, url, ttl):
+        now = time.time()
+        row = self._find(url)
+        if row is None or now - row[4] > ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE responses SET used_at = ? WHERE url = ?", (now, row[0]))
+        final_url, status_code, body, truncated = row[:4]
+        return final_url, status_code, zlib.decompress(body).decode("utf-8"), bool(truncated)
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since de la entrada guardada (caducada o no)."""
+        return self._guarded({}, self._conditional_headers, url)
+
+    def _conditional_headers(self, url):
+        row = self._find(url)
+        headers = {}
+        if row is not None:
+            if row[5]:
+                headers["If-None-Match"] = row[5]
+            if row[6]:
+                headers["If-Modified-Since"] = row[6]
+        return headers
+
+    def revalidate(self, url):
+        """El servidor respondio 304: la entrada vuelve a estar vigente y se devuelve como get()."""
+        return self._guarded(None, self._revalidate, url)
+
+    def _revalidate(self, url):
+        now = time.time()
+        row = self._find(url)
+        if row is None:
+            return None
+        self.revalidated += 1
+        self._db.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE url = ?", (now, now, row[0]))
+        final_url, status_code, body, truncated = row[:4]
+        return final_url, status_code, zlib.decompress(body).decode("utf-8"), bool(truncated)
+
+    def put(self, request_url, final_url, status_code, text, truncated, headers=None):
+        self._guarded(None, self._put, request_url, final_url, status_code, text, truncated, headers)
+
+    def _put(self, request_url, final_url, status_code, text, truncated, headers):
+        body = zlib.compress(text.encode("utf-8"))
+        headers = headers or {}
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses"
+            " (url, request_url, status_code, body, truncated, size, stored_at, used_at, etag, last_modified)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                final_url,
+                request_url,
+                status_code,
+                body,
+                int(truncated),
+                len(body),
+                now,
+                now,
+                headers.get("ETag"),
+                headers.get("Last-Modified"),
+            ),
+        )
+        self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # se baja al 90% para no expulsar en cada put
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for url, size in self._db.execute("SELECT url, size FROM responses ORDER BY used_at"):
+            if excess <= 0:
+                break
+            victims.append((url,))
+            excess -= size
+        self._db.executemany("DELETE FROM responses WHERE url = ?", victims)
+
+    def close(self):
+        self._guarded(None, self._db.close)
+
+
+RESPONSE_CACHE_DB = None
+
+
+def get_response_cache():
+    """Cache de respuestas, o None si esta desactivada (--no-cache) o no se pudo abrir."""
+    global RESPONSE_CACHE_DB, RESPONSE_CACHE
+    if RESPONSE_CACHE and RESPONSE_CACHE_DB is None:
+        try:
+            RESPONSE_CACHE_DB = ResponseCache(state_path(RESPONSES_FILE))
+        except (OSError, sqlite3.Error) as e:
+            print(f"[*] Cache de respuestas desactivada: {e}")
+            RESPONSE_CACHE = False
+    return RESPONSE_CACHE_DB if RESPONSE_CACHE else None
+
+
+def cache_ttl(site):
+    return CACHE_TTL.get(site.category, CACHE_TTL["default"])
+
+
+def response_cache_pass(jobs, on_result):
+    """Sirve desde la cache de respuestas los jobs con entrada vigente.
+
+    Va antes del scheduler: un acierto no consume token del host ni espera
+    su turno. El body guardado se reclasifica con los marcadores actuales.
+    """
+    cache = get_response_cache()
+    if cache is None or CACHE_REFRESH:
+        return jobs
+    remaining = []
+    for job in jobs:
+        username, site = job
+        cached = cache.get(get_redirect_memory().url_for(site, username), cache_ttl(site)) if site.url else None
+        if cached is None:
+            remaining.append(job)
+            continue
+        final_url, status_code, text, truncated = cached
+        status, reason = classify_result(site, status_code, text, username, final_url)
+        if truncated:
+            reason = f"{reason} [body truncated at {site.body_cap()} bytes]"
+        res = make_result(username, site, status, f"{reason} [cache]", final_url, status_code)
+        res["cached"] = True
+        print_result(res)
+        on_result(res)
+    served = len(jobs) - len(remaining)
+    if served:
+        print(f"[*] Cache de respuestas: {served}/{len(jobs)} comprobaciones sin red\n")
+    return remaining
+
+
+# =========================
+# CACHE DE VEREDICTOS (USERNAME, SITIO)
+# =========================
+
+VERDICTS_FILE = "verdicts.json"
+
+
+class VerdictCache:
+    """Ultimo veredicto por (sitio, username) con TTL por status, persistido en STATE_DIR."""
+
+    def __init__(self, data=None):
+        # "slug\tusername" -> {"from": plantilla, "status", "reason", "url", "http_status", "at"}
+        self.data = load_state(VERDICTS_FILE) if data is None else data
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    @staticmethod
+    def _key(username, site):
+        return f"{site.slug}\t{username}"
+
+    def _fresh(self, entry, now):
+        ttl = VERDICT_TTL.get(entry.get("status"), 0)
+        return now - entry.get("at", 0) <= ttl
+
+    def get(self, username, site):
+        """Resultado (marcado cached) si hay un veredicto vigente; si no None."""
+        with self._lock:
+            entry = self.data.get(self._key(username, site))
+        if not entry or entry.get("from") != site.url or not self._fresh(entry, time.time()):
+            return None
+        res = make_result(
+            username,
+            site,
+            entry["status"],
+            f"{entry['reason']} [cached]",
+            entry.get("url", ""),
+            entry.get("http_status", 0),
+        )
+        res["cached"] = True
+        with self._lock:
+            self.hits += 1
+        return res
+
+    def record(self, res, site):
+        if res.get("cached") or res["status"] not in VERDICT_TTL:
+            return
+        entry = {
+            "from": site.url,
+            "status": res["status"],
+            "reason": res["reason"],
+            "url": res["url"],
+            "http_status": res["http_status"],
+            "at": time.time(),
+        }
+        with self._lock:
+            self.data[self._key(res["username"], site)] = entry
+
+    def save(self):
+        now = time.time()
+        with self._lock:
+            data = {k: v for k, v in self.data.items() if self._fresh(v, now)}
+        save_state(VERDICTS_FILE, data)
+
+
+VERDICT_CACHE = None
+
+
+def get_verdict_cache():
+    """Cache de veredictos, o None si esta desactivada (--no-cache)."""
+    global VERDICT_CACHE
+    if not RESPONSE_CACHE:
+        return None
+    if VERDICT_CACHE is None:
+        VERDICT_CACHE = VerdictCache()
+    return VERDICT_CACHE
+
+
+def verdict_cache_pass(jobs, on_result):
+    """Resuelve con la cache de veredictos los jobs que la tengan vigente."""
+    cache = get_verdict_cache()
+    if cache is None or CACHE_REFRESH:
+        return jobs
+    remaining = []
+    for job in jobs:
+        res = cache.get(*job)
+        if res is None:
+            remaining.append(job)
+            continue
+        print_result(res)
+        on_result(res)
+    decided = len(jobs) - len(remaining)
+    if decided:
+        print(f"[*] Cache de veredictos: {decided}/{len(jobs)} comprobaciones sin red\n")
+    return remaining
 
 
 # =========================
@@ -438,6 +2766,10 @@ def print_summary(label, profile, results):
     print(f"ERRORS   : {len(summary['errors'])}")
     print(f"\nGlobal max score : {max_score}")
     print(f"Average score    : {avg_score}")
+    print(f"Bytes received   : {format_bytes(sum(r.get('bytes', 0) for r in results))}")
+    cached = sum(1 for r in results if r.get("cached"))
+    if cached:
+        print(f"Desde cache      : {cached}/{len(results)} resultados")
 
     if hits_sorted:
         print("\n--- TOP MATCHES (by score) ---")
@@ -448,6 +2780,24 @@ def print_summary(label, profile, results):
             )
 
 
+def print_run_stats():
+    """Contadores de toda la ejecucion (pool, caches, TLS): se imprimen una vez al final."""
+    lines = []
+    if HTTP_POOL is not None:
+        pool_stats = HTTP_POOL.stats()
+        lines.append(f"Pool conn hits   : {pool_stats['hits']} (reutilizadas)")
+        lines.append(f"Pool conn misses : {pool_stats['misses']} (nuevas)")
+    if RESPONSE_CACHE_DB is not None:
+        lines.append(f"Cache respuestas : {RESPONSE_CACHE_DB.hits} hits / {RESPONSE_CACHE_DB.misses} misses / {RESPONSE_CACHE_DB.revalidated} revalidadas (304)")
+    if BODY_MEMO.hits:
+        lines.append(f"Bodies repetidos : {BODY_MEMO.hits} (veredicto memorizado)")
+    if TLS_SESSIONS.handshakes:
+        lines.append(f"TLS handshakes   : {TLS_SESSIONS.handshakes} ({TLS_SESSIONS.resumed} reanudados)")
+    if lines:
+        print("\n---------------- EJECUCION ----------------")
+        print("\n".join(lines))
+
+
 # =========================
 # REPORT HTML (AGRUPADO POR USERNAME)
 # =========================
@@ -463,7 +2813,7 @@ def html_escape(s):
     )
 
 
-def save_html_report(label, profile, results, file_tag=None):
+def save_html_report(label, profile, results, file_tag=None, skipped=None):
     summary_global = build_summary(results)
     hits_all = [r for r in results if r["score"] > 0]
     max_score = max((r["score"] for r in hits_all), default=0)
@@ -473,6 +2823,7 @@ def save_html_report(label, profile, results, file_tag=None):
 
     errors_count = len(summary_global["errors"])
     misses_count = len(summary_global["misses"])
+    bytes_total = format_bytes(sum(r.get("bytes", 0) for r in results))
 
     # orden de usernames segun aparecen
     username_order = []
@@ -567,6 +2918,31 @@ def save_html_report(label, profile, results, file_tag=None):
     </tbody>
   </table>
 </section>
+""")
+
+    if skipped:
+        skipped_by_user = {}
+        for username, site in skipped:
+            skipped_by_user.setdefault(username, []).append(site.name)
+        skipped_rows = "".join(
+            f"<tr><td>{html_escape(u)}</td><td>{html_escape(', '.join(names))}</td></tr>"
+            for u, names in skipped_by_user.items()
+        )
+        sections_html.append(f"""
+<section class="u-block">
+  <h2>Skipped (time budget): {len(skipped)}</h2>
+  <table>
+    <thead>
+      <tr>
+        <th>Username</th>
+        <th>Sites</th>
+      </tr>
+    </thead>
+    <tbody>
+      {skipped_rows}
+    </tbody>
+  </table>
+</section>
 """)
 
     hits_count_global = len(hits_all)
@@ -708,6 +3084,10 @@ tr:nth-child(even) td {{
       <div class="stat-label">Misses</div>
       <div class="stat-value">{misses_count}</div>
     </div>
+    <div class="stat-card">
+      <div class="stat-label">Transferred</div>
+      <div class="stat-value">{bytes_total}</div>
+    </div>
   </div>
 </header>
 <main>
@@ -769,11 +3149,40 @@ def open_report_via_termux(report_path):
 # MAIN
 # =========================
 
+def pop_flag_value(args, name, default=None):
+    """Extrae `--name valor` o `--name=valor` de args (lo quita de la lista)."""
+    for i, a in enumerate(args):
+        if a == name:
+            if i + 1 < len(args):
+                value = args[i + 1]
+                del args[i:i + 2]
+                return value
+            del args[i]
+            return default
+        if a.startswith(name + "="):
+            del args[i]
+            return a.split("=", 1)[1]
+    return default
+
+
+def parse_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
 def main():
     args = sys.argv[1:]
     if not args:
         print("Uso:")
         print("  python3 tyke.py <username1> [username2 ...] [profile] [--geonode] [--tor]")
+        print("                  [--engine serial|async|threads] [--concurrency N] [--workers N]")
+        print("                  [--host-rate R] [--host-burst B] [--pool-size N] [--pool-hosts N]")
+        print("                  [--stream] [--max-bytes N] [--budget SECONDS]")
+        print("                  [--two-phase] [--preflight head|get] [--fixed-timeouts] [--no-dns-prefetch]")
+        print("                  [--no-dns-fast-path] [--http2] [--prewarm N] [--no-tls-resume]")
+        print("                  [--no-cache] [--refresh] [--geonode-pages N]")
         print("")
         print("Profiles:")
         print("  all/full  -> todos (default)")
@@ -784,8 +3193,60 @@ def main():
         print("  creative  -> arte/musica/video")
         print("  business  -> LinkedIn/portfolio/negocios")
         print("  gaming    -> Twitch/Steam/PSN/Xbox/etc.")
+        print("")
+        print("Engines:")
+        print("  serial    -> un sitio cada vez, con rate limit por host (default)")
+        print("  async     -> asyncio, hasta N sitios en paralelo (--concurrency, default 8)")
+        print("  threads   -> pool de N hilos (--workers, default 8)")
         sys.exit(1)
 
+    global ENGINE, CONCURRENCY, WORKERS
+    ENGINE = (pop_flag_value(args, "--engine", ENGINE) or ENGINE).lower()
+    CONCURRENCY = max(1, parse_int(pop_flag_value(args, "--concurrency"), CONCURRENCY))
+    workers_arg = pop_flag_value(args, "--workers")
+    if workers_arg is not None:
+        WORKERS = max(1, parse_int(workers_arg, WORKERS))
+        if ENGINE == "serial":
+            ENGINE = "threads"
+    if ENGINE not in ("serial", "async", "threads"):
+        print(f"[*] Engine desconocido '{ENGINE}', usando 'serial'.")
+        ENGINE = "serial"
+
+    global HOST_RATE, HOST_BURST
+    try:
+        HOST_RATE = max(1e-3, float(pop_flag_value(args, "--host-rate", HOST_RATE)))
+    except (TypeError, ValueError):
+        pass
+    HOST_BURST = max(1, parse_int(pop_flag_value(args, "--host-burst"), HOST_BURST))
+
+    global BUDGET
+    try:
+        BUDGET = float(pop_flag_value(args, "--budget", BUDGET))
+    except (TypeError, ValueError):
+        BUDGET = None
+
+    global ADAPTIVE_TIMEOUTS, DNS_PREFETCH, DNS_FAST_PATH, USE_HTTP2
+    global RESPONSE_CACHE, CACHE_REFRESH
+    global TWO_PHASE, PREFLIGHT_METHOD
+    PREFLIGHT_METHOD = (pop_flag_value(args, "--preflight", PREFLIGHT_METHOD) or PREFLIGHT_METHOD).upper()
+    if PREFLIGHT_METHOD not in ("HEAD", "GET"):
+        PREFLIGHT_METHOD = "HEAD"
+
+    global STREAM_MODE, MAX_BODY_BYTES
+    # --stream-max-bytes se mantiene como alias de --max-bytes
+    MAX_BODY_BYTES = parse_int(pop_flag_value(args, "--stream-max-bytes"), MAX_BODY_BYTES)
+    MAX_BODY_BYTES = max(0, parse_int(pop_flag_value(args, "--max-bytes"), MAX_BODY_BYTES))
+
+    global POOL_MAXSIZE, POOL_HOSTS
+    POOL_MAXSIZE = parse_int(pop_flag_value(args, "--pool-size"), POOL_MAXSIZE)
+    POOL_HOSTS = parse_int(pop_flag_value(args, "--pool-hosts"), POOL_HOSTS)
+
+    global GEONODE_PAGES
+    GEONODE_PAGES = max(1, parse_int(pop_flag_value(args, "--geonode-pages"), GEONODE_PAGES))
+
+    global PREWARM_HOSTS, TLS_RESUME
+    PREWARM_HOSTS = max(0, parse_int(pop_flag_value(args, "--prewarm"), PREWARM_HOSTS))
+
     flags = [a for a in args if a.startswith("--")]
     positional = [a for a in args if not a.startswith("--")]
 
@@ -810,6 +3271,15 @@ def main():
     global USE_GEONODE, USE_TOR
     USE_GEONODE = "--geonode" in flags
     USE_TOR = "--tor" in flags
+    STREAM_MODE = "--stream" in flags
+    TWO_PHASE = "--two-phase" in flags
+    ADAPTIVE_TIMEOUTS = "--fixed-timeouts" not in flags
+    DNS_PREFETCH = "--no-dns-prefetch" not in flags
+    DNS_FAST_PATH = "--no-dns-fast-path" not in flags
+    TLS_RESUME = "--no-tls-resume" not in flags
+    RESPONSE_CACHE = "--no-cache" not in flags
+    CACHE_REFRESH = "--refresh" in flags
+    USE_HTTP2 = "--http2" in flags
 
     if USE_TOR:
         print("[*] Usando Tor (socks5h://127.0.0.1:9050). Asegurate de que Tor esta corriendo (ej. `tor` o `termux-services`).")
@@ -817,31 +3287,58 @@ def main():
             print("[*] Aviso: Tor tiene prioridad, se ignoraran los proxies de Geonode.")
     elif USE_GEONODE:
         print("[*] Cargando proxies desde Geonode...")
+        t0 = time.monotonic()
         init_geonode_proxies()
-        print(f"[*] Proxies cargados: {len(PROXIES_LIST)}")
+        print(f"[*] Proxies cargados: {len(PROXIES_LIST)} en {time.monotonic() - t0:.2f}s")
 
     sites, effective_profile = get_sites_for_profile(profile_arg)
 
     print(f"[*] Profile efectivo: {effective_profile}")
-    print(f"[*] Total sitios a comprobar (despues de filtro): {len(sites)}\n")
-
-    all_results = []
-
-    for username in usernames:
-        print("\n" + "=" * 50)
-        print(f"== Buscando username: {username} ==")
-        print("=" * 50 + "\n")
+    print(f"[*] Total sitios a comprobar (despues de filtro): {len(sites)}")
+
+    # un solo pool para todos los usernames: los mismos hosts no se vuelven a marcar
+    global HTTP_POOL
+    parallelism = engine_parallelism()
+    pool_hosts = POOL_HOSTS or len({s.host for s in sites}) * len(usernames)
+    pool_maxsize = POOL_MAXSIZE or parallelism
+    HTTP_POOL = ConnectionPool(hosts=pool_hosts, maxsize=pool_maxsize, tls_resume=TLS_RESUME)
+    print(f"[*] Pool de conexiones: {pool_hosts} hosts x {pool_maxsize} conexiones")
+    transport = init_transport(max_connections=max(pool_hosts, parallelism))
+    print(f"[*] Transporte: {transport.name}")
+    if MAX_BODY_BYTES:
+        print(f"[*] Tope de body: {MAX_BODY_BYTES // 1024} KiB/request (~{parallelism * MAX_BODY_BYTES // (1024 * 1024)} MiB en vuelo)")
+    if ENGINE == "async":
+        print(f"[*] Engine: async (concurrency={CONCURRENCY})\n")
+    elif ENGINE == "threads":
+        print(f"[*] Engine: threads (workers={WORKERS})\n")
+    else:
+        print("[*] Engine: serial\n")
+    if BUDGET is not None:
+        print(f"[*] Presupuesto: {BUDGET:g}s (primero los sitios de mas valor)\n")
 
-        results_user = []
-        for idx, site in enumerate(sites, start=1):
-            print(f"\n[{idx}/{len(sites)}] Comprobando {site.get('name', site.get('slug', 'site'))}...")
-            res = check_site(username, site)
-            results_user.append(res)
-            all_results.append(res)
-            time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
+    print("\n" + "=" * 50)
+    print(f"== Buscando username(s): {', '.join(usernames)} ==")
+    print("=" * 50 + "\n")
 
+    def on_username_done(username, results_user):
         print_summary(username, effective_profile, results_user)
 
+    all_results, skipped = run_scan(usernames, sites, on_username_done, budget=BUDGET, two_phase=TWO_PHASE)
+    update_site_stats(all_results)
+    get_latency_history().save()
+    get_redirect_memory().save()
+    if RESPONSE_CACHE_DB is not None:
+        RESPONSE_CACHE_DB.close()
+    if VERDICT_CACHE is not None:
+        VERDICT_CACHE.save()
+
+    if skipped:
+        print(f"\n[*] Presupuesto agotado: {len(skipped)} comprobaciones saltadas")
+        for username, site in skipped[:20]:
+            print(f"    - {site.slug} ({username})")
+        if len(skipped) > 20:
+            print(f"    ... (+{len(skipped) - 20} mas, ver reporte)")
+
     if len(usernames) > 1:
         label_global = " / ".join(usernames)
         print("\n" + "=" * 50)
@@ -850,6 +3347,7 @@ def main():
         print_summary(label_global, effective_profile, all_results)
     else:
         label_global = usernames[0]
+    print_run_stats()
 
     if len(usernames) <= 3:
         label_for_header = ", ".join(usernames)
@@ -861,9 +3359,12 @@ def main():
     else:
         file_tag = f"{usernames[0]}+{len(usernames)-1}"
 
-    report_path = save_html_report(label_for_header, effective_profile, all_results, file_tag=file_tag)
+    report_path = save_html_report(label_for_header, effective_profile, all_results, file_tag=file_tag, skipped=skipped)
     print(f"\nReporte combinado guardado en: {report_path}")
 
+    HTTP_POOL.close()
+    get_transport().close()
+
     open_report_via_termux(report_path)
 
 